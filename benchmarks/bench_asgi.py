@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Compare the WSGI build (gunicorn, sync worker) with the ASGI build (uvicorn)
+at high concurrency, each with one worker process against the same database
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from common import free_port, load, make_app, report, seed, start_server, stop_server
+
+SERVERS = {
+    "wsgi (gunicorn sync)": ["gunicorn", "--config=/dev/null", "--workers=1", "--bind=127.0.0.1:{port}", "service:app"],
+    "asgi (uvicorn)": [sys.executable, "-m", "uvicorn", "--workers=1", "--port={port}", "--log-level=warning",
+                       "service.asgi:app"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='accounts-bench-'), 'bench.db')}"
+    seed(make_app(SQLALCHEMY_DATABASE_URI=uri), args.accounts)
+
+    def request(client, n):
+        return client.get(f"/accounts/{n % args.accounts + 1}")
+
+    for label, argv in SERVERS.items():
+        port = free_port()
+        server = start_server([part.format(port=port) for part in argv], port, {"DATABASE_URI": uri})
+        try:
+            throughput, samples, errors = load(f"http://127.0.0.1:{port}", request, args.concurrency, args.duration)
+        finally:
+            stop_server(server)
+        print(f"{label:<28} {throughput:8.0f} req/s  errors={errors}")
+        report(f"  latency at c={args.concurrency}", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Benchmark resolving a list of account ids: one GET /accounts/<id> per id
+against a single GET /accounts?ids= and POST /accounts/_get
+
+The account cache is disabled so that every variant reads from the database,
+and the statements each variant executes are counted alongside its latency.
+"""
+import argparse
+import random
+
+from common import make_app, report, seed, timed
+from service.queries import track_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--ids", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    app = make_app(ACCOUNT_CACHE_SIZE=0, LOG_LEVEL="ERROR")
+    seed(app, args.accounts)
+    client = app.test_client()
+    ids = random.Random(0).sample(range(1, args.accounts + 1), args.ids)
+    query = ",".join(map(str, ids))
+    variants = {
+        f"{args.ids} x GET /accounts/<id>": lambda: [client.get(f"/accounts/{account_id}") for account_id in ids],
+        "GET /accounts?ids=": lambda: client.get("/accounts", query_string={"ids": query}),
+        "POST /accounts/_get": lambda: client.post("/accounts/_get", json={"ids": ids}),
+    }
+    for label, func in variants.items():
+        with track_queries() as tracker:
+            func()
+        repeat = max(args.requests // args.ids, 5) if label.endswith("<id>") else args.requests
+        report(f"{label} ({tracker.count} queries)", timed(func, repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /accounts/<id> with the read-through cache on and off
+
+Reads follow a hot-set pattern: 95% of requests hit 100 hot accounts.
+"""
+import argparse
+import random
+
+from common import make_app, report, seed, timed
+
+
+def run(cache_size, accounts, requests):
+    """Return the latency samples for one configuration"""
+    app = make_app(ACCOUNT_CACHE_SIZE=cache_size)
+    seed(app, accounts)
+    client = app.test_client()
+    rng = random.Random(42)
+
+    def read():
+        if rng.random() < 0.95:
+            account_id = rng.randint(1, 100)
+        else:
+            account_id = rng.randint(1, accounts)
+        client.get(f"/accounts/{account_id}")
+
+    timed(read, 200)
+    return timed(read, requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    report("cache off", run(0, args.accounts, args.requests))
+    report("cache on (1024 entries)", run(1024, args.accounts, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression on GET /accounts: bytes saved against CPU cost
+
+For a page of accounts and for the NDJSON stream, the first table sends each
+request with every encoding at the configured level and reports the body size
+and the request latency. The second table compresses the same page at a range
+of levels and reports the CPU time spent compressing, which is the price of
+every byte saved.
+"""
+import argparse
+import time
+
+from common import make_app, percentile, report, seed, timed
+from service.compression import ENCODERS, compress
+
+LEVELS = {"zstd": (1, 3, 9, 19), "br": (1, 4, 6, 11), "gzip": (1, 6, 9)}
+
+
+def cpu_ms(func, repeat):
+    """Return the median CPU time of func in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        samples.append((time.process_time() - start) * 1000)
+    return percentile(samples, 0.50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    app = make_app(MAX_PAGE_SIZE=args.limit, LOG_LEVEL="ERROR")
+    seed(app, args.accounts)
+    client = app.test_client()
+    requests = {f"GET /accounts?limit={args.limit}": (f"/accounts?limit={args.limit}", {}),
+                "GET /accounts (NDJSON stream)": ("/accounts", {"Accept": "application/x-ndjson"})}
+    for label, (url, headers) in requests.items():
+        plain = len(client.get(url, headers=headers).get_data())
+        repeat = args.requests if "stream" not in label else max(args.requests // 20, 5)
+        print(f"{label}: {plain} bytes uncompressed")
+        for encoding in ("identity", *ENCODERS):
+            request_headers = {**headers, "Accept-Encoding": encoding}
+            size = len(client.get(url, headers=request_headers).get_data())
+            print(f"  {encoding:<9} {size:>9} bytes  saved {1 - size / plain:6.1%}")
+            report(f"  {encoding}", timed(lambda: client.get(url, headers=request_headers).get_data(), repeat))
+
+    body = client.get(f"/accounts?limit={args.limit}").get_data()
+    print(f"\nCPU per response of {len(body)} bytes")
+    for encoding, levels in LEVELS.items():
+        if encoding not in ENCODERS:
+            print(f"  {encoding:<5} skipped: not installed")
+            continue
+        for level in levels:
+            size = len(compress(body, encoding, level))
+            cost = cpu_ms(lambda: compress(body, encoding, level), max(args.requests // 10, 5))
+            print(f"  {encoding:<5} level {level:>2}  {size:>8} bytes  saved {1 - size / len(body):6.1%}  "
+                  f"cpu={cost:7.3f}ms  {(len(body) - size) / 1024 / max(cost, 1e-3):8.1f} KiB saved per cpu-ms")
+
+
+if __name__ == "__main__":
+    main()
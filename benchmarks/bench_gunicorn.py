@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Compare gunicorn's defaults (one sync worker) with gunicorn.conf.py
+
+Both servers run against the same database with a mixed read/write load.
+Worker counts follow the CPU quota of the machine running the benchmark;
+set WEB_CONCURRENCY or GUNICORN_THREADS to try other sizes.
+"""
+import argparse
+import os
+import tempfile
+
+from common import free_port, load, make_app, report, seed, start_server, stop_server
+
+SERVERS = {
+    "gunicorn defaults (1 sync)": ["gunicorn", "--config=/dev/null", "--bind=127.0.0.1:{port}", "service:app"],
+    "gunicorn.conf.py": ["gunicorn", "--bind=127.0.0.1:{port}", "service:app"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='accounts-bench-'), 'bench.db')}"
+    seed(make_app(SQLALCHEMY_DATABASE_URI=uri), args.accounts)
+
+    def request(client, n):
+        account_id = n % args.accounts + 1
+        if n % 10 == 0:
+            return client.patch(f"/accounts/{account_id}", json={"phone_number": f"555-{n % 10000:04d}"})
+        if n % 10 == 1:
+            return client.get("/accounts", params={"limit": 20, "after_id": account_id})
+        return client.get(f"/accounts/{account_id}")
+
+    for label, argv in SERVERS.items():
+        port = free_port()
+        server = start_server([part.format(port=port) for part in argv], port, {"DATABASE_URI": uri})
+        try:
+            throughput, samples, errors = load(f"http://127.0.0.1:{port}", request, args.concurrency, args.duration)
+        finally:
+            stop_server(server)
+        print(f"{label:<28} {throughput:8.0f} req/s  errors={errors}")
+        report(f"  latency at c={args.concurrency}", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark adding the security and CORS headers: Flask-Talisman plus Flask-Cors
+against the precomputed SecureHeaders layer
+
+Both variants serve GET / from identical apps, with and without an Origin
+header. Talisman and Flask-Cors are no longer dependencies of the service, so
+the baseline is skipped when they are not installed.
+"""
+import argparse
+
+from common import make_app, report, timed
+from service.headers import SecureHeaders
+from service.logs import stop_logging
+
+
+def with_talisman():
+    """Return an app with the former Talisman and CORS setup, or None when they are not installed"""
+    try:
+        from flask_talisman import Talisman
+        from flask_cors import CORS
+    except ImportError:
+        return None
+    app = make_app()
+    Talisman(app, force_https=False, frame_options='SAMEORIGIN')
+    CORS(app, origins='*')
+    return app
+
+
+def with_secure_headers():
+    """Return an app with the precomputed header layer"""
+    app = make_app()
+    SecureHeaders(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    variants = {"Talisman + Flask-Cors": with_talisman(), "SecureHeaders": with_secure_headers(),
+                "no headers": make_app()}
+    stop_logging()
+    for label, app in variants.items():
+        if app is None:
+            print(f"{label:<28} skipped: not installed")
+            continue
+        client = app.test_client()
+        for name, headers in (("", {}), (" + Origin", {"Origin": "https://example.com"})):
+            for _ in range(200):
+                client.get("/", headers=headers)
+            report(f"{label}{name}", timed(lambda: client.get("/", headers=headers), args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Load-test every account route against a locally started gunicorn server
+
+Seeds --accounts accounts, plus a reserved pool for DELETE, then drives each
+route for --duration seconds at --concurrency. The results go to --output as
+JSON. When a baseline file exists, the run fails if any route loses more than
+--tolerance of its throughput, its p95 or p99 latency grows by more than
+--tolerance, or any request fails. --update-baseline stores this run as the
+new baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from common import PROJECT_ROOT, free_port, load, make_app, percentile, seed, start_server, stop_server
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "benchmarks")
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+COMPARED_LATENCIES = ("p95_ms", "p99_ms")
+
+
+def scenarios(accounts, delete_pool):
+    """Return (name, make_request) pairs covering every account route, DELETE last"""
+    run = int(time.time())
+
+    def account_id(n):
+        return n % accounts + 1
+
+    def body(kind, n):
+        return {"name": f"Load {n}", "email": f"{kind}{run}-{n}@example.com", "address": f"{n} Load Street"}
+
+    def delete(client, n):
+        if n >= delete_pool:
+            raise RuntimeError(f"DELETE used all {delete_pool} reserved accounts; raise --delete-pool")
+        return client.delete(f"/accounts/{accounts + n + 1}")
+
+    return [
+        ("POST /accounts", lambda client, n: client.post("/accounts", json=body("post", n))),
+        ("GET /accounts", lambda client, n: client.get("/accounts", params={"limit": 20, "after_id": account_id(n)})),
+        ("GET /accounts/<id>", lambda client, n: client.get(f"/accounts/{account_id(n)}")),
+        ("GET /accounts?ids=",
+         lambda client, n: client.get("/accounts", params={"ids": ",".join(str(account_id(n + i)) for i in range(20))})),
+        ("PUT /accounts/<id>", lambda client, n: client.put(f"/accounts/{account_id(n)}", json=body("put", n))),
+        ("PATCH /accounts/<id>",
+         lambda client, n: client.patch(f"/accounts/{account_id(n)}", json={"phone_number": f"555-{n % 10000:04d}"})),
+        ("PUT /accounts/by-email/<email>",
+         lambda client, n: client.put(f"/accounts/by-email/bench{account_id(n) - 1}@example.com",
+                                      json={"name": f"Upserted {n}", "address": f"{n} Upsert Road"})),
+        ("DELETE /accounts/<id>", delete),
+    ]
+
+
+def summarize(throughput, samples, errors):
+    """Return the recorded figures for one scenario"""
+    result = {"throughput_rps": round(throughput, 1), "requests": len(samples), "errors": errors}
+    for key, fraction in zip(LATENCY_KEYS, (0.50, 0.95, 0.99)):
+        result[key] = round(percentile(samples, fraction), 3) if samples else None
+    return result
+
+
+def regressions(results, baseline, tolerance):
+    """Return a description of every way results fall short of baseline by more than tolerance"""
+    problems = []
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        if current["errors"]:
+            problems.append(f"{name}: {current['errors']} failed requests")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {current['throughput_rps']} req/s < baseline {base['throughput_rps']}")
+        for key in COMPARED_LATENCIES:
+            if current[key] is not None and base[key] and current[key] > base[key] * (1 + tolerance):
+                problems.append(f"{name}: {key} {current[key]} > baseline {base[key]}")
+    return problems
+
+
+def write_json(path, data):
+    """Write data as indented JSON"""
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2)
+        handle.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--delete-pool", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--only", action="append", help="run only scenarios whose name contains this text")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "load_results.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "load_baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='accounts-bench-'), 'load.db')}"
+    seed(make_app(SQLALCHEMY_DATABASE_URI=uri), args.accounts + args.delete_pool)
+
+    port = free_port()
+    argv = ["gunicorn", "--config=/dev/null", f"--bind=127.0.0.1:{port}", f"--workers={args.workers}",
+            f"--threads={args.threads}", "service:app"]
+    server = start_server(argv, port, {"DATABASE_URI": uri})
+    results = {
+        "config": {key: getattr(args, key) for key in ("accounts", "concurrency", "duration", "workers", "threads")},
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "scenarios": {},
+    }
+    try:
+        for name, make_request in scenarios(args.accounts, args.delete_pool):
+            if args.only and not any(text in name for text in args.only):
+                continue
+            result = summarize(*load(f"http://127.0.0.1:{port}", make_request, args.concurrency, args.duration,
+                                     error_status=400))
+            results["scenarios"][name] = result
+            print(f"{name:<32} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:7.2f}ms  "
+                  f"p95={result['p95_ms']:7.2f}ms  p99={result['p99_ms']:7.2f}ms  errors={result['errors']}")
+    finally:
+        stop_server(server)
+    write_json(args.output, results)
+
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handle:
+            problems = regressions(results, json.load(handle), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        print("ok" if not problems else f"{len(problems)} regressions beyond {args.tolerance:.0%}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of logging in the request handlers
+
+Each GET /accounts/<id> logs two INFO lines. The baseline writes them
+synchronously with a plain StreamHandler, as Flask's default handler did. The
+queue pipeline only enqueues them and leaves formatting and writing to its
+background thread. --write-delay-ms makes every write sleep, to model a
+stderr pipe whose reader is falling behind.
+"""
+import argparse
+import itertools
+import logging
+import os
+import tempfile
+import time
+
+from flask.logging import default_handler
+
+from common import make_app, report, seed, timed
+from service.logs import LOGGER_NAME, configure_logging, flush_logs, stop_logging
+
+FLASK_FORMAT = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+
+
+class SlowFile:
+    """File wrapper whose writes take at least delay seconds"""
+
+    def __init__(self, handle, delay):
+        self.handle = handle
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.handle.write(text)
+
+    def flush(self):
+        self.handle.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--write-delay-ms", type=float, default=0.0)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    app = make_app()
+    stop_logging()
+    app.logger.removeHandler(default_handler)  # Flask adds it when no handler is configured
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.WARNING)
+    seed(app, args.accounts)
+    client = app.test_client()
+    ids = itertools.cycle(range(1, args.accounts + 1))
+    for _ in range(args.accounts):
+        client.get(f"/accounts/{next(ids)}")  # warm the account cache so the logging cost stands out
+
+    handle = open(os.path.join(tempfile.mkdtemp(prefix="accounts-bench-"), "log.jsonl"), "w", encoding="utf-8")
+    sink = SlowFile(handle, args.write_delay_ms / 1000) if args.write_delay_ms else handle
+
+    def run(label):
+        report(label, timed(lambda: client.get(f"/accounts/{next(ids)}"), args.requests))
+
+    run("no INFO logging")
+
+    logger.setLevel(logging.INFO)
+    direct = logging.StreamHandler(sink)
+    direct.setFormatter(logging.Formatter(FLASK_FORMAT))
+    logger.addHandler(direct)
+    run("synchronous handler")
+    logger.removeHandler(direct)
+
+    pipelines = (("queue pipeline", {}), (f"queue, sampled {args.sample_rate:.0%}", {"get_accounts": args.sample_rate}))
+    for label, rates in pipelines:
+        app.config['LOG_SAMPLE_RATES'] = rates
+        configure_logging(app, sink)
+        run(label)
+        flush_logs()
+    handle.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Benchmark the probe endpoints against a trivial route dispatched by Flask
+
+GET / returns a constant JSON body, as /health used to, so it measures what a
+probe costs when it goes through the request context and the before/after
+request hooks. /health and /ready are answered by ProbeMiddleware instead;
+/ready is measured while its cached verdict is fresh. All three go through the
+same security header layer.
+"""
+import argparse
+
+from common import report, timed
+import service
+from service.logs import stop_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # The package app carries the security headers, like the deployed one
+    client = service.app.test_client()
+    stop_logging()
+    for path in ("/", "/health", "/ready"):
+        for _ in range(200):
+            client.get(path)
+
+    report("GET / through Flask", timed(lambda: client.get("/"), args.requests))
+    report("/health fast path", timed(lambda: client.get("/health"), args.requests))
+    report("/ready (cached)", timed(lambda: client.get("/ready"), args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark the GET /accounts search filters and check their query plans
+
+Each search is timed against the alternative it replaces, downloading every
+account and filtering on the client. The script exits non-zero when a search
+is not answered from its index.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from common import make_app, report, seed, timed
+from service.models import Account, db
+
+SEARCHES = (
+    ("email", "ix_accounts_email_lower", {"email": "BENCH4242@example.com"}),
+    ("name prefix", "ix_accounts_name", {"name_prefix": "Bench 4242"}),
+    ("join date window", "ix_accounts_date_joined",
+     {"joined_after": "2024-03-01", "joined_before": "2024-03-02"}),
+)
+
+
+def spread_join_dates(app):
+    """Give the seeded accounts one join date per minute from 2024-01-01 and refresh planner statistics"""
+    with app.app_context():
+        db.session.execute(db.text("UPDATE accounts SET date_joined = datetime('2024-01-01', '+' || id || ' minutes')"))
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+
+def query_plan(app, search):
+    """Return the SQLite query plan for the first page of a search"""
+    criteria = Account.search_criteria(
+        email=search.get("email"),
+        name_prefix=search.get("name_prefix"),
+        joined_after=datetime.fromisoformat(search["joined_after"]) if "joined_after" in search else None,
+        joined_before=datetime.fromisoformat(search["joined_before"]) if "joined_before" in search else None,
+    )
+    with app.app_context():
+        statement = db.select(Account).where(*criteria).order_by(Account.id).limit(100)
+        sql = str(statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        return " / ".join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app = make_app(ACCOUNT_CACHE_SIZE=0)
+    seed(app, args.accounts)
+    spread_join_dates(app)
+    client = app.test_client()
+
+    ndjson = {"Accept": "application/x-ndjson"}
+    report("full download", timed(lambda: client.get("/accounts", headers=ndjson).get_data(), 5))
+    failures = 0
+    for label, index, search in SEARCHES:
+        plan = query_plan(app, search)
+        uses_index = index in plan
+        failures += not uses_index
+        print(f"{label}: {'uses' if uses_index else 'DOES NOT use'} {index} ({plan})")
+        report(label, timed(lambda: client.get("/accounts", query_string=search).get_data(), args.requests))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
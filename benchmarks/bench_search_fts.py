@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /accounts/search against a large table
+
+Accounts get names and street addresses drawn from small word lists, so the
+queries below range from a handful of matches to thousands.
+"""
+import argparse
+import random
+
+from common import make_app, report, timed
+from service.models import Account, db
+
+FIRST_NAMES = ("Ada", "Bruno", "Chloe", "Dmitri", "Elena", "Farah", "Gustav", "Hana", "Ivan", "Jonas",
+               "Keiko", "Liam", "Marta", "Nadia", "Oscar", "Priya", "Quentin", "Rosa", "Sven", "Tariq")
+LAST_NAMES = ("Abbott", "Bergstrom", "Castillo", "Dubois", "Eriksen", "Fontaine", "Gallagher", "Hoffmann",
+              "Ibrahim", "Jovanovic", "Kowalski", "Lindqvist", "Moreau", "Nakamura", "Okafor", "Petrov",
+              "Quintero", "Rossi", "Schneider", "Takahashi", "Underwood", "Valdez", "Whitfield", "Yamamoto")
+STREETS = ("Oak", "Maple", "Birch", "Cedar", "Elm", "Willow", "Juniper", "Hawthorn", "Sycamore", "Chestnut",
+           "Magnolia", "Poplar", "Alder", "Linden", "Rowan", "Sequoia")
+SUFFIXES = ("Street", "Avenue", "Lane", "Court", "Road", "Way", "Terrace", "Drive")
+
+QUERIES = (
+    ("partial name", "keik naka"),
+    ("partial street", "sequ terr"),
+    ("common word", "street"),
+)
+
+
+def seed_people(app, count, batch=10000):
+    """Insert count accounts with varied names and addresses"""
+    rng = random.Random(42)
+    with app.app_context():
+        for start in range(0, count, batch):
+            rows = [
+                {"name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}", "email": f"person{i}@example.com",
+                 "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)} {rng.choice(SUFFIXES)}"}
+                for i in range(start, min(start + batch, count))
+            ]
+            db.session.execute(Account.__table__.insert(), rows)
+            db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    seed_people(app, args.accounts)
+    client = app.test_client()
+    person = client.get("/accounts/4242").get_json()
+    one_person = ("one person", person["name"])
+    for label, query in (one_person,) + QUERIES:
+        params = {"q": query, "limit": args.limit}
+        matches = len(client.get("/accounts/search", query_string={"q": query, "limit": 1000}).get_json())
+        report(f"{label} ({matches}{'+' if matches == 1000 else ''} hits)",
+               timed(lambda: client.get("/accounts/search", query_string=params).get_data(), args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the account read path: rows/sec for serialization alone, and
+for fetching plus serializing one page, comparing ORM objects with column rows
+and the default JSON provider with the orjson-backed one
+"""
+import argparse
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from common import make_app, seed
+from service.encoding import FastJSONProvider
+from service.models import Account, serialize_values
+
+
+def rate(label, rows, func, repeat):
+    """Print rows per second for func over repeat runs"""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {rows * repeat / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = make_app()
+    seed(app, args.rows)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    with app.app_context():
+        accounts = Account.query.order_by(Account.id).limit(args.rows).all()
+        rows = Account.page_values(0, args.rows)
+
+        print("serialization only")
+        rate("  ORM serialize() + default provider", args.rows,
+             lambda: default.response([a.serialize() for a in accounts]), args.repeat)
+        rate("  rows serialize_values() + default provider", args.rows,
+             lambda: default.response([serialize_values(r) for r in rows]), args.repeat)
+        rate("  rows serialize_values() + orjson provider", args.rows,
+             lambda: fast.response([serialize_values(r) for r in rows]), args.repeat)
+
+        print("fetch + serialize")
+        rate("  ORM query + default provider", args.rows,
+             lambda: default.response([a.serialize() for a in Account.query.order_by(Account.id).limit(args.rows)]),
+             args.repeat)
+        rate("  column rows + orjson provider", args.rows,
+             lambda: fast.response([serialize_values(r) for r in Account.page_values(0, args.rows)]), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
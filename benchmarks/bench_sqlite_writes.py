@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent writers against one SQLite file, with and without the
+connection pragmas from service.config
+
+Each process plays the part of a gunicorn worker and commits one account per
+POST /accounts request.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the project on sys.path)
+from service import config
+from service.routes import create_app
+from service.schema import init_db
+
+
+def worker(uri, tuned, worker_id, writes, results):
+    """Create accounts one request at a time and report successes and failures"""
+    overrides = {"SQLALCHEMY_DATABASE_URI": uri, "ACCOUNT_CACHE_SIZE": 0}
+    if not tuned:
+        config.SQLITE_PRAGMAS.clear()
+        overrides["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 0}}
+    app = create_app(overrides)
+    app.logger.disabled = True
+    client = app.test_client()
+    ok = failed = 0
+    for i in range(writes):
+        account = {"name": f"Writer {worker_id}", "email": f"w{worker_id}-{i}@example.com"}
+        try:
+            resp = client.post("/accounts", json=account)
+            ok += resp.status_code == 201
+            failed += resp.status_code != 201
+        except Exception:  # "database is locked" surfaces as an OperationalError
+            failed += 1
+    results.put((ok, failed))
+
+
+def run(tuned, workers, writes):
+    """Run one configuration and print its throughput"""
+    workdir = tempfile.mkdtemp(prefix="accounts-bench-")
+    uri = f"sqlite:///{os.path.join(workdir, 'writes.db')}"
+    init_db(create_app({"SQLALCHEMY_DATABASE_URI": uri}))
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(uri, tuned, n, writes, results)) for n in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    ok = sum(result[0] for result in totals)
+    failed = sum(result[1] for result in totals)
+    label = "tuned (WAL, busy timeout)" if tuned else "default (rollback journal)"
+    print(f"{label:<28} {ok / elapsed:8.0f} writes/s  ok={ok} failed={failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+    run(False, args.workers, args.writes)
+    run(True, args.workers, args.writes)
+
+
+if __name__ == "__main__":
+    main()
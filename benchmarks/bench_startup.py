@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker startup: import time and time to the first request
+
+Each run starts a fresh interpreter, imports the service package, then builds
+the app and answers GET /health as a worker would after gunicorn forks it.
+The script exits non-zero when the median of either step exceeds its threshold.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import PROJECT_ROOT, make_app
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import service
+imported = time.perf_counter()
+service.app.test_client().get("/health")
+answered = time.perf_counter()
+print(json.dumps({"import": (imported - start) * 1000, "first_request": (answered - start) * 1000}))
+"""
+
+
+def measure(uri):
+    """Return the import and first-request times of one fresh interpreter, in milliseconds"""
+    env = {**os.environ, "DATABASE_URI": uri}
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=PROJECT_ROOT, env=env, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-import-ms", type=float, default=1000)
+    parser.add_argument("--max-first-request-ms", type=float, default=1200)
+    args = parser.parse_args()
+
+    # An initialized database, as a worker would find it after the init-db step
+    uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='accounts-bench-'), 'startup.db')}"
+    make_app(SQLALCHEMY_DATABASE_URI=uri)
+    samples = [measure(uri) for _ in range(args.runs)]
+
+    failed = False
+    for key, limit in (("import", args.max_import_ms), ("first_request", args.max_first_request_ms)):
+        values = [sample[key] for sample in samples]
+        median = statistics.median(values)
+        verdict = "ok" if median <= limit else "REGRESSION"
+        failed = failed or median > limit
+        print(f"{key:<14} median={median:7.1f}ms  max={max(values):7.1f}ms  threshold={limit:.0f}ms  {verdict}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
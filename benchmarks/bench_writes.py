@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-statement PUT/PATCH/DELETE against read-before-write
+
+The read-before-write baseline is registered on the benchmark app only. It
+loads the account through the ORM, mutates it and commits, which is what the
+update and delete routes used to do.
+"""
+import argparse
+import itertools
+
+from flask import request
+
+from common import make_app, report, seed, timed
+from service.models import Account
+
+
+def add_baseline_routes(app):
+    """Register the read-before-write update and delete used for comparison"""
+    @app.route("/baseline/<int:account_id>", methods=["PUT"])
+    def baseline_update(account_id):
+        account = Account.find(account_id)
+        account.deserialize(request.get_json())
+        account.save()
+        return account.serialize()
+
+    @app.route("/baseline/<int:account_id>", methods=["DELETE"])
+    def baseline_delete(account_id):
+        account = Account.find(account_id)
+        if account:
+            account.delete()
+        return "", 204
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(ACCOUNT_CACHE_SIZE=0)
+    add_baseline_routes(app)
+    seed(app, args.accounts)
+    client = app.test_client()
+    counter = itertools.count()
+
+    def body():
+        i = next(counter)
+        return {"name": f"Updated {i}", "email": f"updated{i}@example.com", "address": f"{i} Write Street"}
+
+    ids = itertools.cycle(range(1, args.requests + 1))
+    report("PUT read-before-write", timed(lambda: client.put(f"/baseline/{next(ids)}", json=body()), args.requests))
+    report("PUT single statement", timed(lambda: client.put(f"/accounts/{next(ids)}", json=body()), args.requests))
+    report("PATCH single statement",
+           timed(lambda: client.patch(f"/accounts/{next(ids)}", json={"name": "Patched"}), args.requests))
+
+    ids = iter(range(1, args.accounts + 1))
+    report("DELETE read-before-write", timed(lambda: client.delete(f"/baseline/{next(ids)}"), args.requests))
+    report("DELETE single statement", timed(lambda: client.delete(f"/accounts/{next(ids)}"), args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from service.models import Account, db  # noqa: E402
+from service.routes import create_app  # noqa: E402
+from service.schema import init_db  # noqa: E402
+
+
+def make_app(**config):
+    """Create an app backed by a throwaway SQLite database"""
+    workdir = tempfile.mkdtemp(prefix="accounts-bench-")
+    config.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    config.setdefault("EXPORT_DIR", workdir)
+    app = create_app(config)
+    init_db(app)
+    return app
+
+
+def seed(app, count, batch=10000):
+    """Insert count synthetic accounts with batched executemany statements"""
+    with app.app_context():
+        for start in range(0, count, batch):
+            rows = [
+                {"name": f"Bench {i}", "email": f"bench{i}@example.com",
+                 "address": f"{i} Benchmark Avenue, Suite {i % 100}", "phone_number": f"555-{i % 10000:04d}"}
+                for i in range(start, min(start + batch, count))
+            ]
+            db.session.execute(Account.__table__.insert(), rows)
+            db.session.commit()
+
+
+def percentile(samples, fraction):
+    """Return the given percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, repeat):
+    """Call func repeat times and return per-call latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    """Print p50/p99 latency for a list of millisecond samples"""
+    print(f"{label:<28} p50={percentile(samples, 0.50):7.3f}ms  p99={percentile(samples, 0.99):7.3f}ms  "
+          f"n={len(samples)}")
+
+
+def free_port():
+    """Return a TCP port that is free on localhost"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(argv, port, env=None, timeout=30):
+    """Start a server process from the project root and wait until /health answers"""
+    process = subprocess.Popen(argv, cwd=PROJECT_ROOT, env={**os.environ, **(env or {})},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(argv)} did not start on port {port}")
+
+
+def stop_server(process):
+    """Stop a server started by start_server"""
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def load(base_url, make_request, concurrency, duration, error_status=500):
+    """Drive the server with concurrency clients for duration seconds
+
+    make_request(client, n) sends the n-th request with an httpx.AsyncClient
+    and returns the response. Responses with a status of error_status or above
+    count as errors. Returns (requests per second, latency samples in ms, errors).
+    """
+    import httpx  # only needed when driving a live server
+
+    async def run():
+        samples = []
+        errors = 0
+        counter = iter(range(10 ** 9))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            deadline = time.perf_counter() + duration
+
+            async def user():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        resp = await make_request(client, next(counter))
+                        errors += resp.status_code >= error_status
+                    except httpx.HTTPError:
+                        errors += 1
+                    samples.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+            return len(samples) / (time.perf_counter() - start), samples, errors
+
+    return asyncio.run(run())
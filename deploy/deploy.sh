@@ -21,6 +21,7 @@ oc wait --for=condition=ready pod -l name=accounts --timeout=300s
 
 # Deploy the Account Service
 echo "Deploying Account Service..."
+oc apply -f exports-pvc.yaml
 oc apply -f deployment.yaml
 oc apply -f service.yaml
 oc apply -f route.yaml
@@ -0,0 +1,108 @@
+"""
+Gunicorn Configuration
+
+Loaded automatically by ``gunicorn service:app`` when started from the project
+root. Workers and threads are sized from the container's CPU quota rather than
+the host's core count, and every setting can be overridden from the environment:
+
+    GUNICORN_BIND                  address to listen on (default 0.0.0.0:$PORT, PORT defaults to 8080)
+    WEB_CONCURRENCY                worker processes (default 2 per CPU of quota plus 1)
+    GUNICORN_THREADS               threads per worker (default 4)
+    GUNICORN_WORKER_CLASS          worker class (default gthread)
+    GUNICORN_TIMEOUT               seconds before a silent worker is restarted (default 30)
+    GUNICORN_KEEPALIVE             seconds to hold idle keep-alive connections (default 5)
+    GUNICORN_MAX_REQUESTS          requests before a worker is recycled, 0 to disable (default 5000);
+                                   recycling a worker fails the exports it is running
+    GUNICORN_MAX_REQUESTS_JITTER   random extra requests so workers recycle at different times (default 500)
+    GUNICORN_PRELOAD               load the app in the master before forking (default true)
+    GUNICORN_LOG_LEVEL             log level (default info)
+    PROMETHEUS_MULTIPROC_DIR       where workers share their metrics (default $TMPDIR/accounts-metrics)
+"""
+import math
+import os
+import tempfile
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def cpu_limit(cgroup_root=CGROUP_ROOT):
+    """Return the CPUs available to this container, from the cgroup quota when there is one"""
+    quota = _cgroup_v2_quota(cgroup_root) or _cgroup_v1_quota(cgroup_root)
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    return min(quota, available) if quota else available
+
+
+def _cgroup_v2_quota(cgroup_root):
+    """Return the CPU quota from cgroup v2 cpu.max, or None when unlimited"""
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max"), encoding="utf-8") as handle:
+            quota, period = handle.read().split()
+    except (OSError, ValueError):
+        return None
+    if quota == "max":
+        return None
+    return int(quota) / int(period)
+
+
+def _cgroup_v1_quota(cgroup_root):
+    """Return the CPU quota from cgroup v1 cfs files, or None when unlimited"""
+    try:
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us"), encoding="utf-8") as handle:
+            quota = int(handle.read())
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us"), encoding="utf-8") as handle:
+            period = int(handle.read())
+    except (OSError, ValueError):
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return quota / period
+
+
+def default_workers(cpus):
+    """Return the worker count for a CPU quota: two per CPU plus one, rounding a fractional CPU up"""
+    return 2 * math.ceil(cpus) + 1 if cpus >= 1 else 2
+
+
+def _env_flag(name, default):
+    """Return a boolean environment setting"""
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8080')}")
+workers = int(os.environ.get("WEB_CONCURRENCY") or default_workers(cpu_limit()))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 500))
+preload_app = _env_flag("GUNICORN_PRELOAD", "true")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Set before the app is loaded, which is when prometheus_client reads it
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(tempfile.gettempdir(), "accounts-metrics"))
+os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def on_starting(server):
+    """Start from an empty metrics directory so samples from an earlier run are not counted"""
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".db"):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections instead of sharing the master's pool"""
+    from service import app
+    from service.models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Stop counting the live gauges of a worker that has exited"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,47 @@
+"""
+Alembic environment for the accounts database
+
+Runs inside the Flask app set up by ``service.schema.init_migrations``, using
+its engine and metadata. Logging is configured by the app, not by alembic.ini.
+"""
+import logging
+from alembic import context
+from flask import current_app
+
+logger = logging.getLogger("alembic.env")
+
+config = context.config
+target_db = current_app.extensions["migrate"].db
+config.set_main_option("sqlalchemy.url",
+                       target_db.engine.url.render_as_string(hide_password=False).replace("%", "%%"))
+
+
+def run_migrations_offline():
+    """Emit the migrations as SQL without connecting to the database"""
+    context.configure(url=config.get_main_option("sqlalchemy.url"), target_metadata=target_db.metadata,
+                      literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run the migrations on a connection from the app's engine"""
+
+    def process_revision_directives(context, revision, directives):
+        """Do not write an empty revision when autogenerate finds no changes"""
+        if getattr(config.cmd_opts, "autogenerate", False) and directives[0].upgrade_ops.is_empty():
+            directives[:] = []
+            logger.info("No changes in schema detected.")
+
+    configure_args = current_app.extensions["migrate"].configure_args
+    configure_args.setdefault("process_revision_directives", process_revision_directives)
+    with target_db.engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_db.metadata, **configure_args)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,29 @@
+"""Add the version column used for optimistic locking and ETags
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all before migrations existed may already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('accounts')}
+    if 'version' not in columns:
+        # Existing rows start at version 1, like freshly inserted ones
+        op.add_column('accounts', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('accounts') as batch_op:
+        batch_op.drop_column('version')
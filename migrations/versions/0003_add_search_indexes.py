@@ -0,0 +1,59 @@
+"""Add the indexes behind the email, name prefix and join date filters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Name prefixes compare byte-wise: SQLite does by default, PostgreSQL needs the "C" collation
+NAME_INDEX = {'sqlite': ('ix_accounts_name', ['name']),
+              'postgresql': ('ix_accounts_name_c', [sa.text('name COLLATE "C"')])}
+INDEXES = [
+    ('ix_accounts_email_lower', [sa.text('lower(email)')]),
+    ('ix_accounts_date_joined', ['date_joined']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    indexes = INDEXES + ([NAME_INDEX[bind.dialect.name]] if bind.dialect.name in NAME_INDEX else [])
+    if bind.dialect.name != 'postgresql':
+        _create_missing(bind, indexes)
+        return
+    # CONCURRENTLY builds without blocking writes but cannot run in a transaction. A build that
+    # failed leaves an invalid index behind, which is dropped so that it is built again.
+    with op.get_context().autocommit_block():
+        invalid = bind.exec_driver_sql(
+            "SELECT index.relname FROM pg_index JOIN pg_class AS index ON index.oid = pg_index.indexrelid "
+            "WHERE pg_index.indrelid = 'accounts'::regclass AND NOT pg_index.indisvalid"
+        ).scalars().all()
+        for name in invalid:
+            op.drop_index(name, table_name='accounts', postgresql_concurrently=True)
+        _create_missing(bind, indexes, postgresql_concurrently=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    names = [name for name, _ in INDEXES]
+    if bind.dialect.name in NAME_INDEX:
+        names.append(NAME_INDEX[bind.dialect.name][0])
+    for name in names:
+        op.drop_index(name, table_name='accounts')
+
+
+def _create_missing(bind, indexes, **kw):
+    """Create the indexes the table does not have yet, as databases created by create_all may"""
+    existing = {index['name'] for index in sa.inspect(bind).get_indexes('accounts')}
+    for name, columns in indexes:
+        if name not in existing:
+            op.create_index(name, 'accounts', columns, **kw)
@@ -2,7 +2,9 @@
 """
 Run the Account Service
 """
-from service.routes import app
+from service import app
+from service.schema import init_db
 
 if __name__ == "__main__":
+    init_db(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
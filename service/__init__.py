@@ -1,19 +1,31 @@
 """
 Account Service with Security Headers and CORS
+
+``service.app`` is built on first access rather than on import, so importing the
+package neither builds an app nor touches the database. The schema is created
+by a separate step, ``flask --app service accounts init-db``.
 """
-from flask_talisman import Talisman
-from flask_cors import CORS
+import threading
+from service.headers import SecureHeaders
 from service.routes import create_app
 
-# Create the Flask app
-app = create_app()
+_build_lock = threading.Lock()
+
+
+def build_app(config=None):
+    """Create the Flask app with security headers and CORS, returning the app and its header layer"""
+    app = create_app(config)
+
+    # Security headers and allow-all CORS, precomputed once for every response
+    talisman = SecureHeaders(app, force_https=False)  # Allow HTTP for testing
+    return app, talisman
 
-# Initialize Talisman for security headers
-talisman = Talisman(
-    app,
-    force_https=False,  # Allow HTTP for testing
-    frame_options='SAMEORIGIN'
-)
 
-# Initialize CORS for cross-origin resource sharing
-CORS(app, origins='*')
+def __getattr__(name):
+    """Build the module-level app and talisman the first time either is used"""
+    if name not in ("app", "talisman"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _build_lock:
+        if "app" not in globals():
+            globals()["app"], globals()["talisman"] = build_app()
+    return globals()[name]
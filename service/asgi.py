@@ -0,0 +1,321 @@
+"""
+Account Service ASGI Application
+
+An async variant of the account routes for ASGI servers:
+
+    uvicorn service.asgi:app --host 0.0.0.0 --port 8080
+
+It serves a subset of the Flask app's routes from async SQLAlchemy sessions
+(aiosqlite locally, asyncpg for PostgreSQL) against the same database, with the
+same responses, security and CORS headers:
+
+    GET    /                         GET /health
+    POST   /accounts                 GET /accounts (keyset pages and NDJSON stream)
+    GET    /accounts/<id>            PUT /accounts/<id>
+    DELETE /accounts/<id>
+
+List filters, sparse fields, PATCH, search, upsert by email, batch reads, bulk
+operations, exports, /ready, /metrics and the CLI are only on the Flask app.
+Like the Flask app it never creates the schema on startup; that is the job of
+``flask --app service accounts init-db``.
+"""
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from service import status
+from service.config import apply_sqlite_pragmas, database_uri, engine_options, statement_timeout
+from service.headers import HSTS_HEADER, SECURITY_HEADERS, cors_headers
+from service.models import ACCOUNT_FIELDS, Account, is_unique_violation, page_etag, parse_etag
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def async_database_uri(uri):
+    """Return the async driver URI for a URI used by the Flask app"""
+    relative = uri.startswith("sqlite:///") and not uri.startswith("sqlite:////") and ":memory:" not in uri
+    if relative:
+        # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+        uri = "sqlite:///" + os.path.join(INSTANCE_PATH, uri[len("sqlite:///"):])
+    for sync_prefix, async_prefix in (("sqlite://", "sqlite+aiosqlite://"), ("postgresql://", "postgresql+asyncpg://")):
+        if uri.startswith(sync_prefix):
+            return async_prefix + uri[len(sync_prefix):]
+    return uri
+
+
+def async_engine_options(uri, environ):
+    """Return engine options for the async driver of uri"""
+    options = engine_options(uri, environ)
+    if uri.startswith("postgresql"):
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout(environ))}}
+    return options
+
+
+def create_asgi_app(config=None):
+    """Create the ASGI app, applying any config overrides"""
+    config = config or {}
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or database_uri(os.environ)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        engine = create_async_engine(async_database_uri(uri), **async_engine_options(uri, os.environ))
+        if engine.dialect.name == "sqlite":
+            event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+        app.state.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        yield
+        await engine.dispose()
+
+    routes = [
+        Route("/", index),
+        Route("/health", health_check),
+        Route("/accounts", list_accounts, methods=["GET"]),
+        Route("/accounts", create_accounts, methods=["POST"]),
+        Route("/accounts/{account_id:int}", get_accounts, methods=["GET"]),
+        Route("/accounts/{account_id:int}", update_accounts, methods=["PUT"]),
+        Route("/accounts/{account_id:int}", delete_accounts, methods=["DELETE"]),
+    ]
+    exception_handlers = {StaleDataError: concurrent_update, IntegrityError: constraint_violation}
+    app = Starlette(routes=routes, lifespan=lifespan, exception_handlers=exception_handlers)
+    return SecurityHeadersMiddleware(app)
+
+
+class SecurityHeadersMiddleware:
+    """ASGI middleware adding the headers SecureHeaders adds to the Flask app"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope["headers"])
+        origin = request_headers.get(b"origin", b"").decode("latin-1")
+        extra = [(name.encode(), value.encode()) for name, value in SECURITY_HEADERS]
+        if scope["scheme"] == "https":
+            extra.append((HSTS_HEADER[0].encode(), HSTS_HEADER[1].encode()))
+
+        preflight_method = request_headers.get(b"access-control-request-method")
+        if scope["method"] == "OPTIONS" and preflight_method:
+            allow = request_headers.get(b"access-control-request-headers", b"").decode("latin-1")
+            cors = cors_headers(origin, preflight_method.decode("latin-1"), allow)
+            await Response(status_code=status.HTTP_200_OK, headers=dict(cors))(scope, receive, _with_headers(send, extra))
+            return
+        extra = [(name.encode(), value.encode()) for name, value in cors_headers(origin)] + extra
+        await self.app(scope, receive, _with_headers(send, extra))
+
+
+def _with_headers(send, extra):
+    """Wrap send so the response start message carries the extra headers"""
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message["headers"] = list(message.get("headers", [])) + extra
+        await send(message)
+    return wrapped
+
+
+def _dumps(body):
+    """Encode a body exactly like Flask's default JSON provider"""
+    return json.dumps(body, sort_keys=True, separators=(",", ":")) + "\n"
+
+
+def _json_response(body, code=status.HTTP_200_OK, headers=None, etag=None):
+    """Return a JSON response, tagged with etag when given"""
+    response = Response(_dumps(body), status_code=code, headers=headers, media_type=JSON_MIMETYPE)
+    if etag:
+        response.headers["ETag"] = quote_etag(etag)
+    return response
+
+
+def _conditional_response(request, etag, build_body, headers=None):
+    """Answer 304 Not Modified when the client already holds etag, otherwise build the body"""
+    if parse_etags(request.headers.get("if-none-match")).contains(etag):
+        response = Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers["ETag"] = quote_etag(etag)
+        return response
+    return _json_response(build_body(), headers=headers, etag=etag)
+
+
+def _not_found(account_id):
+    """Return the 404 raised for a missing account"""
+    return HTTPException(status.HTTP_404_NOT_FOUND, f"Account with id '{account_id}' was not found.")
+
+
+def _if_match_version(request, account_id):
+    """Return the version an If-Match header requires, or None when there is no precondition"""
+    if_match = parse_etags(request.headers.get("if-match"))
+    if not if_match or if_match.star_tag:
+        return None
+    for etag in if_match.as_set():
+        parsed = parse_etag(etag)
+        if parsed and parsed[0] == account_id:
+            return parsed[1]
+    return 0
+
+
+async def _json_body(request):
+    """Return the decoded JSON request body"""
+    try:
+        return await request.json()
+    except ValueError as error:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Request body must be valid JSON.") from error
+
+
+async def concurrent_update(request, error):
+    """Report a lost update race instead of a server error"""
+    logger.warning("Concurrent update detected: %s", error)
+    return _json_response({"error": "Account was modified concurrently; retry the request."}, status.HTTP_409_CONFLICT)
+
+
+async def constraint_violation(request, error):
+    """Report a write rejected by a constraint as a client error instead of a server error"""
+    if is_unique_violation(error):
+        logger.info("Duplicate account rejected: %s", error.orig)
+        return _json_response({"error": "An account with this email already exists."}, status.HTTP_409_CONFLICT)
+    logger.info("Invalid account rejected: %s", error.orig)
+    return _json_response({"error": "Account is missing a required field."}, status.HTTP_400_BAD_REQUEST)
+
+
+async def index(request):
+    """Root endpoint"""
+    return _json_response({"message": "Account Service"})
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    return _json_response({"status": "healthy"})
+
+
+async def create_accounts(request):
+    """Create an Account"""
+    logger.info("Request to create an Account")
+    account = Account().deserialize(await _json_body(request))
+    async with request.app.state.sessions() as session:
+        session.add(account)
+        await session.commit()
+    logger.info("Account with ID [%s] saved.", account.id)
+    return _json_response(account.serialize(), status.HTTP_201_CREATED, etag=account.etag)
+
+
+async def list_accounts(request):
+    """Returns a page of Accounts ordered by id"""
+    logger.info("Request to list Accounts")
+    accept = parse_accept_header(request.headers.get("accept"), MIMEAccept)
+    if accept.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return StreamingResponse(_stream_accounts(request.app.state.sessions), media_type=NDJSON_MIMETYPE)
+    try:
+        after_id = int(request.query_params.get("after_id", 0))
+        limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError as error:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "limit and after_id must be integers.") from error
+    if limit < 1:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "limit must be a positive integer.")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    statement = select(Account).where(Account.id > after_id).order_by(Account.id).limit(limit)
+    async with request.app.state.sessions() as session:
+        accounts = (await session.scalars(statement)).all()
+    headers = {}
+    if len(accounts) == limit:
+        headers["Link"] = f'<{request.url.path}?limit={limit}&after_id={accounts[-1].id}>; rel="next"'
+    logger.info("Returning %d accounts", len(accounts))
+    etag = page_etag(limit, [(account.id, account.version) for account in accounts])
+    return _conditional_response(request, etag, lambda: [account.serialize() for account in accounts], headers)
+
+
+async def _stream_accounts(sessions):
+    """Yield every Account as one JSON document per line, reading in batches"""
+    statement = select(Account).order_by(Account.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+    async with sessions() as session:
+        result = await session.stream_scalars(statement)
+        async for account in result:
+            yield json.dumps(account.serialize()) + "\n"
+
+
+async def get_accounts(request):
+    """Retrieve a single Account"""
+    account_id = request.path_params["account_id"]
+    logger.info("Request to retrieve Account with id: %s", account_id)
+    async with request.app.state.sessions() as session:
+        account = await session.get(Account, account_id)
+    if account is None:
+        raise _not_found(account_id)
+    return _conditional_response(request, account.etag, account.serialize)
+
+
+async def update_accounts(request):
+    """Update an Account"""
+    account_id = request.path_params["account_id"]
+    logger.info("Request to update Account with id: %s", account_id)
+    data = await _json_body(request)
+    version = _if_match_version(request, account_id)
+    async with request.app.state.sessions() as session:
+        if version is not None:
+            account = await _update_if_version(session, account_id, version, data)
+        else:
+            account = await session.get(Account, account_id)
+            if account is None:
+                raise _not_found(account_id)
+            account.deserialize(data)
+        await session.commit()
+    logger.info("Account with ID [%s] updated.", account_id)
+    return _json_response(account.serialize(), etag=account.etag)
+
+
+async def _update_if_version(session, account_id, version, data):
+    """Update an account in one statement if it is still at version"""
+    values = {field: data.get(field) for field in ACCOUNT_FIELDS}
+    statement = (
+        update(Account)
+        .where(Account.id == account_id, Account.version == version)
+        .values(**values, version=Account.version + 1)
+        .returning(Account)
+    )
+    account = (await session.scalars(statement)).one_or_none()
+    if account is None:
+        await _precondition_failed(session, account_id)
+    return account
+
+
+async def _precondition_failed(session, account_id):
+    """Raise 404 when the account is gone, otherwise 412"""
+    if await session.scalar(select(Account.id).where(Account.id == account_id)) is None:
+        raise _not_found(account_id)
+    raise HTTPException(status.HTTP_412_PRECONDITION_FAILED, f"Account with id '{account_id}' has been modified.")
+
+
+async def delete_accounts(request):
+    """Delete an Account"""
+    account_id = request.path_params["account_id"]
+    logger.info("Request to delete Account with id: %s", account_id)
+    version = _if_match_version(request, account_id)
+    condition = [Account.id == account_id]
+    if version is not None:
+        condition.append(Account.version == version)
+    async with request.app.state.sessions() as session:
+        result = await session.execute(delete(Account).where(*condition))
+        await session.commit()
+        if version is not None and result.rowcount == 0:
+            await _precondition_failed(session, account_id)
+    logger.info("Account with ID [%s] delete complete.", account_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+app = create_asgi_app()
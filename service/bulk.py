@@ -0,0 +1,174 @@
+"""
+Bulk Account Operations
+
+Applies a list of create/update/delete operations inside a single transaction.
+Consecutive operations of the same kind are executed as one batched statement,
+and each item is validated up front so that a bad item only fails itself.
+"""
+from itertools import groupby
+from sqlalchemy import bindparam, delete, insert
+from sqlalchemy.exc import IntegrityError
+from service.models import ACCOUNT_FIELDS, Account, db
+from service import status
+
+
+class BulkConflictError(Exception):
+    """Raised when the batch hits a conflict that could not be detected up front"""
+
+
+def apply_operations(operations):
+    """Apply the operations in order and return one result per item"""
+    results = [None] * len(operations)
+    indexed = list(enumerate(operations))
+    try:
+        for op, run in groupby(indexed, key=lambda item: _op_name(item[1])):
+            handler = _HANDLERS.get(op, _reject_unknown)
+            handler(list(run), results)
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        raise BulkConflictError(str(error.orig)) from error
+    return results
+
+
+def _op_name(operation):
+    """Return the operation name, or None when the item is malformed"""
+    if isinstance(operation, dict):
+        return operation.get("op")
+    return None
+
+
+def _result(index, op, code, **extra):
+    """Build the per-item result"""
+    return {"index": index, "op": op, "status": code, **extra}
+
+
+def account_values(data):
+    """Extract the writable account columns from an operation payload"""
+    if not isinstance(data, dict) or not data.get("name") or not data.get("email"):
+        return None
+    return {field: data.get(field) for field in ACCOUNT_FIELDS}
+
+
+def _account_id(operation):
+    """Return the operation's account id, or None unless it is an integer (JSON true and false are not)"""
+    account_id = operation.get("id")
+    return account_id if isinstance(account_id, int) and not isinstance(account_id, bool) else None
+
+
+def _taken_emails(emails):
+    """Return a mapping of email to account id for the emails already stored"""
+    if not emails:
+        return {}
+    rows = db.session.execute(db.select(Account.email, Account.id).where(Account.email.in_(emails)))
+    return dict(rows.all())
+
+
+def _existing_ids(ids):
+    """Return the subset of ids that exist"""
+    if not ids:
+        return set()
+    return set(db.session.scalars(db.select(Account.id).where(Account.id.in_(ids))))
+
+
+def _reject_unknown(run, results):
+    """Fail every item whose op is not create, update or delete"""
+    for index, operation in run:
+        results[index] = _result(index, _op_name(operation), status.HTTP_400_BAD_REQUEST,
+                                 error="op must be one of create, update or delete")
+
+
+def _bulk_create(run, results):
+    """Insert every valid item of the run with one executemany INSERT"""
+    pending = []
+    for index, operation in run:
+        values = account_values(operation.get("data"))
+        if values is None:
+            results[index] = _result(index, "create", status.HTTP_400_BAD_REQUEST, error="name and email are required")
+        else:
+            pending.append((index, values))
+
+    taken = _taken_emails([values["email"] for _, values in pending])
+    rows = []
+    for index, values in pending:
+        if values["email"] in taken:
+            results[index] = _result(index, "create", status.HTTP_409_CONFLICT, error="email already exists")
+            continue
+        taken[values["email"]] = None
+        rows.append((index, values))
+    if not rows:
+        return
+
+    # RETURNING in parameter order would fall back to one INSERT per row, so read the ids back by email
+    db.session.execute(insert(Account), [values for _, values in rows])
+    ids = _taken_emails([values["email"] for _, values in rows])
+    for index, values in rows:
+        results[index] = _result(index, "create", status.HTTP_201_CREATED, id=ids[values["email"]])
+
+
+def _bulk_update(run, results):
+    """Update every valid item of the run with one executemany UPDATE by primary key"""
+    pending = []
+    for index, operation in run:
+        values = account_values(operation.get("data"))
+        if values is None or _account_id(operation) is None:
+            results[index] = _result(index, "update", status.HTTP_400_BAD_REQUEST,
+                                     error="id, name and email are required")
+        else:
+            pending.append((index, operation["id"], values))
+
+    existing = _existing_ids([account_id for _, account_id, _ in pending])
+    owners = _taken_emails([values["email"] for _, _, values in pending])
+    rows = []
+    for index, account_id, values in pending:
+        if account_id not in existing:
+            results[index] = _result(index, "update", status.HTTP_404_NOT_FOUND, id=account_id,
+                                     error=f"Account with id '{account_id}' was not found.")
+        elif owners.get(values["email"], account_id) != account_id:
+            results[index] = _result(index, "update", status.HTTP_409_CONFLICT, id=account_id,
+                                     error="email already exists")
+        else:
+            owners[values["email"]] = account_id
+            rows.append((index, account_id, values))
+    if not rows:
+        return
+
+    table = Account.__table__
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam("account_id"))
+        .values(**{field: bindparam(field) for field in ACCOUNT_FIELDS}, version=table.c.version + 1)
+    )
+    db.session.execute(statement, [{"account_id": account_id, **values} for _, account_id, values in rows])
+    for index, account_id, _ in rows:
+        results[index] = _result(index, "update", status.HTTP_200_OK, id=account_id)
+
+
+def _bulk_delete(run, results):
+    """Delete every existing item of the run with one DELETE ... WHERE id IN"""
+    pending = []
+    for index, operation in run:
+        if _account_id(operation) is None:
+            results[index] = _result(index, "delete", status.HTTP_400_BAD_REQUEST, error="id is required")
+        else:
+            pending.append((index, operation["id"]))
+
+    existing = _existing_ids([account_id for _, account_id in pending])
+    deleted = []
+    for index, account_id in pending:
+        if account_id in existing:
+            existing.discard(account_id)
+            deleted.append(account_id)
+            results[index] = _result(index, "delete", status.HTTP_204_NO_CONTENT, id=account_id)
+        else:
+            results[index] = _result(index, "delete", status.HTTP_404_NOT_FOUND, id=account_id,
+                                     error=f"Account with id '{account_id}' was not found.")
+    if deleted:
+        db.session.execute(delete(Account).where(Account.id.in_(deleted)))
+
+
+_HANDLERS = {
+    "create": _bulk_create,
+    "update": _bulk_update,
+    "delete": _bulk_delete,
+}
@@ -0,0 +1,114 @@
+"""
+Account Cache
+
+A small read-through cache placed in front of ``Account.find``. Any object with
+the same ``get``/``generation``/``set``/``invalidate``/``clear``/``stats`` methods
+can be plugged in instead, e.g. one backed by a shared store. The in-process
+``LRUCache`` is only invalidated by writes made in the same process, so its TTL
+bounds how stale an entry can get when several workers or replicas write to the
+same database. It is disabled by default for that reason.
+
+Readers take ``generation(key)`` before querying and pass it to ``set``. A value
+read before the key was invalidated is then dropped instead of being cached, so
+a slow reader cannot put back a row that a concurrent writer just changed.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullCache:
+    """Cache that never stores anything, used when caching is disabled"""
+
+    def get(self, key):
+        """Always miss"""
+        return None
+
+    def generation(self, key):
+        """Nothing is stored, so there is nothing to compare"""
+        return None
+
+    def set(self, key, value, generation=None):
+        """Discard the value"""
+
+    def invalidate(self, key):
+        """Nothing to invalidate"""
+
+    def clear(self):
+        """Nothing to clear"""
+
+    def stats(self):
+        """Return empty counters"""
+        return {"hits": 0, "misses": 0, "size": 0, "maxsize": 0}
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+
+    def __init__(self, maxsize=1024, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; each invalidated key remembers the value it was given,
+        # for the last maxsize keys, and _floor covers clear() and keys forgotten since
+        self._generation = 0
+        self._invalidated = OrderedDict()
+        self._floor = 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key):
+        """Return a token to pass to set() for a value about to be read"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, generation=None):
+        """Store a value, evicting the least recently used entry when full
+
+        When generation is given the value is dropped if the key was invalidated since it was taken.
+        """
+        with self._lock:
+            if generation is not None and generation < max(self._floor, self._invalidated.get(key, 0)):
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                self._floor = self._invalidated.popitem(last=False)[1]
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
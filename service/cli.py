@@ -0,0 +1,136 @@
+"""
+Account Service CLI Commands
+
+Registered on the app as ``flask accounts ...``.
+"""
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from service.bulk import account_values
+from service.models import ACCOUNT_FIELDS, Account, db
+from service.schema import init_db
+
+accounts_cli = AppGroup("accounts", help="Manage accounts.")
+
+
+@accounts_cli.command("init-db")
+def init_db_command():
+    """Create the database tables and search index if they do not exist"""
+    init_db(current_app)
+    click.echo("Database schema is up to date")
+
+
+@accounts_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["ndjson", "csv"]),
+              help="Input format. Defaults to the file extension.")
+@click.option("--chunk-size", default=5000, show_default=True, type=click.IntRange(min=1),
+              help="Rows inserted and committed per chunk.")
+@click.option("--checkpoint", type=click.Path(dir_okay=False),
+              help="File recording progress so an interrupted import can resume.")
+def import_accounts(path, file_format, chunk_size, checkpoint):
+    """Import accounts from an NDJSON or CSV file"""
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    done = _read_checkpoint(checkpoint, path)
+    if done:
+        click.echo(f"Resuming {path} after {done} rows")
+
+    stats = {"imported": 0, "rejected": 0, "duplicates": 0}
+    start = time.perf_counter()
+    with open(path, newline="", encoding="utf-8") as source:
+        rows = islice(_read_rows(source, file_format), done, None)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _insert_chunk(chunk, stats)
+            done += len(chunk)
+            _write_checkpoint(checkpoint, path, done)
+
+    elapsed = time.perf_counter() - start
+    rate = stats["imported"] / elapsed if elapsed else 0
+    click.echo(f"Imported {stats['imported']} rows in {elapsed:.2f}s ({rate:.0f} rows/s), "
+               f"rejected {stats['rejected']}, skipped {stats['duplicates']} duplicates")
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+
+def _read_rows(source, file_format):
+    """Yield one dictionary (or None for an unparsable line) per input row"""
+    if file_format == "csv":
+        for row in csv.DictReader(source):
+            yield {field: value or None for field, value in row.items()}
+        return
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _insert_chunk(chunk, stats):
+    """Validate a chunk, drop rows whose email already exists and insert the rest"""
+    valid = {}
+    for row in chunk:
+        values = account_values(row)
+        if values is None:
+            stats["rejected"] += 1
+        elif values["email"] in valid:
+            stats["duplicates"] += 1
+        else:
+            valid[values["email"]] = values
+
+    if valid:
+        taken = db.session.scalars(db.select(Account.email).where(Account.email.in_(list(valid))))
+        for email in taken:
+            del valid[email]
+            stats["duplicates"] += 1
+    if valid:
+        _executemany(list(valid.values()))
+    db.session.commit()
+    stats["imported"] += len(valid)
+
+
+def _executemany(rows):
+    """Insert rows with a single DBAPI executemany, bypassing per-row statement processing"""
+    connection = db.session.connection()
+    dialect = connection.dialect
+    columns = ACCOUNT_FIELDS + ("date_joined",)
+    compiled = Account.__table__.insert().compile(dialect=dialect, column_keys=list(columns))
+    joined = datetime.utcnow()
+    processor = Account.__table__.c.date_joined.type.dialect_impl(dialect).bind_processor(dialect)
+    joined = processor(joined) if processor else joined
+    for row in rows:
+        row["date_joined"] = joined
+    if compiled.positional:
+        rows = [tuple(row[key] for key in compiled.positiontup) for row in rows]
+    connection.exec_driver_sql(str(compiled), rows)
+
+
+def _read_checkpoint(checkpoint, path):
+    """Return the number of rows already imported from path"""
+    if not checkpoint or not os.path.exists(checkpoint):
+        return 0
+    with open(checkpoint, encoding="utf-8") as handle:
+        state = json.load(handle)
+    if state.get("source") != os.path.abspath(path):
+        raise click.ClickException(f"Checkpoint {checkpoint} belongs to {state.get('source')}")
+    return state["rows"]
+
+
+def _write_checkpoint(checkpoint, path, rows):
+    """Atomically record that rows input rows have been committed"""
+    if not checkpoint:
+        return
+    temporary = f"{checkpoint}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump({"source": os.path.abspath(path), "rows": rows}, handle)
+    os.replace(temporary, checkpoint)
@@ -0,0 +1,146 @@
+"""
+Response Compression
+
+Responses are compressed with the best encoding the client's
+``Accept-Encoding`` allows among zstd, brotli and gzip, in that order of
+preference when the client rates them equally. zstd and brotli are used when
+their packages are installed; gzip is always available. ``COMPRESSION_LEVELS``
+sets the level of each encoding, and leaving an encoding out disables it.
+
+Buffered responses smaller than ``COMPRESSION_MIN_SIZE`` are sent as they are.
+Streamed responses are compressed chunk by chunk and flushed every
+``STREAM_FLUSH_SIZE`` bytes of input, so clients keep receiving complete lines
+while the stream is running. The ETag of a compressed response is made weak,
+since the bytes differ from the uncompressed representation. A 304 Not Modified
+gets the same ``Vary`` header and weak ETag as the compressed response it
+revalidates, without any work on the body.
+"""
+import zlib
+from flask import request
+from service import status
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = frozenset(("application/json", "application/x-ndjson", "text/csv", "text/html",
+                                    "text/plain"))
+STREAM_FLUSH_SIZE = 64 * 1024
+
+
+def _gzip_encoder(level):
+    """Return the compress, flush and finish functions of a gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli_encoder(level):
+    """Return the compress, flush and finish functions of a brotli stream"""
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd_encoder(level):
+    """Return the compress, flush and finish functions of a zstd stream"""
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+
+
+# In order of preference
+ENCODERS = {"zstd": _zstd_encoder, "br": _brotli_encoder, "gzip": _gzip_encoder}
+if zstandard is None:  # pragma: no cover - zstandard is optional
+    del ENCODERS["zstd"]
+if brotli is None:  # pragma: no cover - brotli is optional
+    del ENCODERS["br"]
+
+
+def compress(data, encoding, level):
+    """Return data compressed as one complete stream"""
+    encode, _, finish = ENCODERS[encoding](level)
+    return encode(data) + finish()
+
+
+def compress_stream(chunks, encoding, level):
+    """Compress an iterable of byte chunks incrementally, flushing every STREAM_FLUSH_SIZE bytes of input"""
+    encode, flush, finish = ENCODERS[encoding](level)
+    pending = 0
+    for chunk in chunks:
+        pending += len(chunk)
+        data = encode(chunk)
+        if pending >= STREAM_FLUSH_SIZE:
+            data += flush()
+            pending = 0
+        if data:
+            yield data
+    yield finish()
+
+
+def init_compression(app):
+    """Compress the responses of app that the client accepts compressed"""
+    levels = {encoding: level for encoding, level in app.config['COMPRESSION_LEVELS'].items()
+              if encoding in ENCODERS}
+    encodings = [encoding for encoding in ENCODERS if encoding in levels]
+    min_size = app.config['COMPRESSION_MIN_SIZE']
+    if not encodings:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        """Compress the response body with the encoding negotiated from Accept-Encoding"""
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return _not_modified(response, encodings)
+        if not _compressible(response):
+            return response
+        if not response.is_streamed and response.calculate_content_length() < min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = _closing(compress_stream(response.iter_encoded(), encoding, levels[encoding]),
+                                         response.response)
+        else:
+            response.set_data(compress(response.get_data(), encoding, levels[encoding]))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _compressible(response):
+    """Return whether the response carries an uncompressed body worth compressing"""
+    return (response.mimetype in COMPRESSIBLE_MIMETYPES and not response.direct_passthrough
+            and "Content-Encoding" not in response.headers
+            and response.status_code != status.HTTP_204_NO_CONTENT)
+
+
+def _not_modified(response, encodings):
+    """Give a 304 the Vary header and weak ETag of the compressed response it revalidates
+
+    A 304 has no body to measure against COMPRESSION_MIN_SIZE, so the client's tag decides:
+    it only holds the weak form when the response it cached was compressed.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak and request.if_none_match.is_weak(etag) and request.accept_encodings.best_match(encodings):
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _closing(chunks, source):
+    """Yield chunks, closing the iterable they are produced from when the response is closed"""
+    try:
+        yield from chunks
+    finally:
+        if hasattr(source, "close"):
+            source.close()
@@ -0,0 +1,71 @@
+"""
+Database Configuration
+
+Builds the SQLAlchemy URI and engine options from the environment, as set by
+deploy/deployment.yaml, so every replica talks to the same database.
+
+Environment variables:
+    DATABASE_URI                  full URI, takes precedence over the parts below
+    DATABASE_HOST / DATABASE_PORT / DATABASE_NAME / DATABASE_USER / DATABASE_PASSWORD
+    DATABASE_POOL_SIZE            connections kept open per process (default 5)
+    DATABASE_MAX_OVERFLOW         extra connections allowed under load (default 10)
+    DATABASE_POOL_RECYCLE         seconds before a connection is replaced (default 1800)
+    DATABASE_POOL_PRE_PING        test connections before use (default true)
+    DATABASE_STATEMENT_TIMEOUT    PostgreSQL statement timeout in milliseconds (default 30000)
+    SQLITE_BUSY_TIMEOUT           milliseconds SQLite waits on a locked database (default 5000)
+"""
+from urllib.parse import quote_plus
+
+DEFAULT_DATABASE_URI = "sqlite:///accounts.db"
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+}
+
+
+def database_uri(environ):
+    """Return the database URI described by the environment"""
+    if environ.get("DATABASE_URI"):
+        return environ["DATABASE_URI"]
+    if not environ.get("DATABASE_HOST"):
+        return DEFAULT_DATABASE_URI
+    credentials = quote_plus(environ.get("DATABASE_USER", "postgres"))
+    if environ.get("DATABASE_PASSWORD"):
+        credentials += ":" + quote_plus(environ["DATABASE_PASSWORD"])
+    host = environ["DATABASE_HOST"]
+    port = environ.get("DATABASE_PORT", "5432")
+    name = environ.get("DATABASE_NAME", "postgres")
+    return f"postgresql://{credentials}@{host}:{port}/{name}"
+
+
+def engine_options(uri, environ):
+    """Return SQLALCHEMY_ENGINE_OPTIONS for the URI, tuned from the environment"""
+    options = {
+        "pool_pre_ping": environ.get("DATABASE_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(environ.get("DATABASE_POOL_RECYCLE", 1800)),
+    }
+    if uri.startswith("sqlite"):
+        options["connect_args"] = {"timeout": int(environ.get("SQLITE_BUSY_TIMEOUT", 5000)) / 1000}
+        return options
+    options["pool_size"] = int(environ.get("DATABASE_POOL_SIZE", 5))
+    options["max_overflow"] = int(environ.get("DATABASE_MAX_OVERFLOW", 10))
+    if uri.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout(environ)}"}
+    return options
+
+
+def statement_timeout(environ):
+    """Return the PostgreSQL statement timeout in milliseconds"""
+    return int(environ.get("DATABASE_STATEMENT_TIMEOUT", 30000))
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection for concurrent readers and writers"""
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
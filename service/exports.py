@@ -0,0 +1,203 @@
+"""
+Account Export Jobs
+
+Exports run on a bounded thread pool so that request workers stay free while the
+accounts table is streamed to a gzip-compressed NDJSON or CSV file. Job state is
+kept in a small JSON file next to the export, so every worker process sharing the
+export directory can report progress and serve the finished file.
+
+Each state file names the process that owns the job, and that process touches
+the files of its unfinished jobs every ``EXPORT_HEARTBEAT_SECONDS``. A job whose
+owner has exited, or whose state file has not been touched for three heartbeats,
+is reported as failed instead of staying in progress forever.
+"""
+import csv
+import gzip
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from service.models import SERIALIZED_FIELDS, Account, serialize_values
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+_IN_PROGRESS = ("pending", "running")
+_MISSED_HEARTBEATS = 3
+_executor = None
+_executor_lock = threading.Lock()
+_active_jobs = set()
+_heartbeat = None
+
+
+def start_export(app, file_format):
+    """Queue an export job and return its initial state"""
+    job_id = uuid.uuid4().hex
+    state = {"id": job_id, "format": file_format, "status": "pending", "rows": 0, "total": None,
+             "owner": {"host": socket.gethostname(), "pid": os.getpid()}}
+    _write_state(app, state)
+    _start_heartbeat(app)
+    _active_jobs.add(job_id)
+    _get_executor(app).submit(_run_export, app, job_id)
+    return state
+
+
+def load_state(app, job_id):
+    """Return the state of an export job, or None if it does not exist"""
+    if not _JOB_ID.fullmatch(job_id):
+        return None
+    state = _read_state(app, job_id)
+    if state and state["status"] in _IN_PROGRESS and _orphaned(app, state):
+        app.logger.warning("Export %s was abandoned by its worker", job_id)
+        state.update(status="failed", error="The export was interrupted; start a new one.")
+        _write_state(app, state)
+    return state
+
+
+def export_path(app, state):
+    """Return the path of the finished export file"""
+    return os.path.join(_export_dir(app), f"{state['id']}.{state['format']}.gz")
+
+
+def _export_dir(app):
+    """Return the export directory, creating it on first use"""
+    path = app.config['EXPORT_DIR'] or os.path.join(app.instance_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _state_path(app, job_id):
+    """Return the path of the job state file"""
+    return os.path.join(_export_dir(app), f"{job_id}.json")
+
+
+def _read_state(app, job_id):
+    """Return the contents of a job state file, or None if it does not exist"""
+    try:
+        with open(_state_path(app, job_id), encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _orphaned(app, state):
+    """Return whether the process owning an unfinished job is gone"""
+    owner = state.get("owner") or {}
+    if owner.get("host") == socket.gethostname() and not _process_exists(owner.get("pid")):
+        return True
+    try:
+        touched = os.path.getmtime(_state_path(app, state["id"]))
+    except FileNotFoundError:
+        return True
+    return time.time() - touched > _MISSED_HEARTBEATS * app.config['EXPORT_HEARTBEAT_SECONDS']
+
+
+def _process_exists(pid):
+    """Return whether a process with this pid is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _start_heartbeat(app):
+    """Start the thread touching the state files of this process's unfinished jobs"""
+    global _heartbeat
+    with _executor_lock:
+        if _heartbeat is not None and _heartbeat.is_alive():
+            return
+        _heartbeat = threading.Thread(target=_beat, args=(app,), name="account-export-heartbeat", daemon=True)
+        _heartbeat.start()
+
+
+def _beat(app):
+    """Touch the state file of every unfinished job once per heartbeat"""
+    while True:
+        time.sleep(app.config['EXPORT_HEARTBEAT_SECONDS'])
+        for job_id in list(_active_jobs):
+            try:
+                os.utime(_state_path(app, job_id))
+            except FileNotFoundError:
+                _active_jobs.discard(job_id)
+
+
+def _write_state(app, state):
+    """Atomically replace the job state file"""
+    path = _state_path(app, state["id"])
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(temporary, path)
+
+
+def _get_executor(app):
+    """Return the process-wide export thread pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['EXPORT_WORKERS'],
+                                           thread_name_prefix="account-export")
+        return _executor
+
+
+def _ndjson_writer(out):
+    """Return a function writing one account per line"""
+    def write(record):
+        out.write(json.dumps(record))
+        out.write("\n")
+    return write
+
+
+def _csv_writer(out):
+    """Return a function writing one account per CSV row, after a header"""
+    writer = csv.DictWriter(out, fieldnames=SERIALIZED_FIELDS)
+    writer.writeheader()
+    return writer.writerow
+
+
+_WRITERS = {"ndjson": _ndjson_writer, "csv": _csv_writer}
+
+
+def _run_export(app, job_id):
+    """Stream the accounts table into the export file, recording progress as it goes"""
+    with app.app_context():
+        state = _read_state(app, job_id)
+        if state is None or state["status"] not in _IN_PROGRESS:
+            app.logger.warning("Export %s is no longer pending, skipping it", job_id)
+            _active_jobs.discard(job_id)
+            return
+        try:
+            state.update(status="running", total=Account.query.count())
+            _write_state(app, state)
+            _write_export(app, state)
+            state["status"] = "completed"
+        except Exception as error:
+            app.logger.exception("Export %s failed", job_id)
+            state.update(status="failed", error=str(error))
+        finally:
+            _active_jobs.discard(job_id)
+        _write_state(app, state)
+        app.logger.info("Export %s %s with %d rows", job_id, state["status"], state["rows"])
+
+
+def _write_export(app, state):
+    """Write every account to a temporary file and move it into place when done"""
+    batch_size = app.config['STREAM_BATCH_SIZE']
+    path = export_path(app, state)
+    partial = f"{path}.part"
+    with gzip.open(partial, "wt", encoding="utf-8", newline="",
+                   compresslevel=app.config['EXPORT_COMPRESSLEVEL']) as out:
+        write = _WRITERS[state["format"]](out)
+        for values in Account.stream_values(batch_size):
+            write(serialize_values(values))
+            state["rows"] += 1
+            if state["rows"] % batch_size == 0:
+                _write_state(app, state)
+    os.replace(partial, path)
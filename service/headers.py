@@ -0,0 +1,86 @@
+"""
+Security and CORS Headers
+
+The security headers and the allow-all CORS policy of the service, spelled out
+once. ``SecureHeaders`` applies them to the Flask app as WSGI middleware, and
+the ASGI entry point sends exactly the same set. The header list for the common
+cases is built at startup, so a response costs a single list extend; only
+requests that send an ``Origin`` build their CORS headers.
+"""
+from werkzeug.utils import redirect
+from werkzeug.wsgi import get_current_url
+
+SECURITY_HEADERS = (
+    ("Permissions-Policy", "browsing-topics=()"),
+    ("X-Frame-Options", "SAMEORIGIN"),
+    ("X-Content-Type-Options", "nosniff"),
+    ("Content-Security-Policy", "default-src 'self'; object-src 'none'"),
+    ("Referrer-Policy", "strict-origin-when-cross-origin"),
+)
+
+# Only sent over HTTPS
+HSTS_HEADER = ("Strict-Transport-Security", "max-age=31556926; includeSubDomains")
+
+CORS_ALLOW_METHODS = "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+def cors_headers(origin, request_method=None, request_headers=None):
+    """Return the CORS headers for a request from origin, including preflight answers"""
+    if not origin:
+        return [("Access-Control-Allow-Origin", "*")]
+    headers = [("Access-Control-Allow-Origin", origin)]
+    if request_method:
+        if request_headers:
+            headers.append(("Access-Control-Allow-Headers", request_headers))
+        headers.append(("Access-Control-Allow-Methods", CORS_ALLOW_METHODS))
+    headers.append(("Vary", "Origin"))
+    return headers
+
+
+class SecureHeaders:
+    """WSGI middleware adding the security and CORS headers to every response of a Flask app
+
+    Setting ``force_https`` redirects plain HTTP requests to HTTPS, except in
+    debug or testing mode and behind a proxy that reports ``X-Forwarded-Proto: https``.
+    """
+
+    def __init__(self, app, force_https=False):
+        self.app = app
+        self.force_https = force_https
+        self.wsgi_app = app.wsgi_app
+        self._http_headers = cors_headers(None) + list(SECURITY_HEADERS)
+        self._https_headers = self._http_headers + [HSTS_HEADER]
+        app.wsgi_app = self
+
+    def __call__(self, environ, start_response):
+        secure = environ.get("wsgi.url_scheme") == "https"
+        origin = environ.get("HTTP_ORIGIN")
+        if origin:
+            extra = self._origin_headers(environ, origin, secure)
+        else:
+            extra = self._https_headers if secure else self._http_headers
+
+        def start_with_headers(status, headers, exc_info=None):
+            headers.extend(extra)
+            return start_response(status, headers, exc_info)
+
+        if self.force_https and not secure and not self._exempt(environ):
+            url = "https://" + get_current_url(environ).split("://", 1)[1]
+            return redirect(url, code=302)(environ, start_with_headers)
+        return self.wsgi_app(environ, start_with_headers)
+
+    @staticmethod
+    def _origin_headers(environ, origin, secure):
+        """Build the headers for a cross-origin request, answering preflights"""
+        preflight = None
+        if environ["REQUEST_METHOD"] == "OPTIONS":
+            preflight = environ.get("HTTP_ACCESS_CONTROL_REQUEST_METHOD")
+        headers = cors_headers(origin, preflight, environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS"))
+        headers.extend(SECURITY_HEADERS)
+        if secure:
+            headers.append(HSTS_HEADER)
+        return headers
+
+    def _exempt(self, environ):
+        """Return whether a plain HTTP request is allowed through despite force_https"""
+        return self.app.debug or self.app.testing or environ.get("HTTP_X_FORWARDED_PROTO") == "https"
@@ -0,0 +1,182 @@
+"""
+Structured Logging
+
+Log records from the ``service`` loggers are written as one JSON object per
+line by a background thread. Request handlers only put the record on a queue,
+so a slow or blocked stderr never holds up a response. Records made during a
+request carry its method, path and endpoint.
+
+Hot read paths can be sampled: ``LOG_SAMPLE_RATES`` maps an endpoint name to
+the fraction of its requests whose records below WARNING are kept. The choice
+is made once per request, so a sampled request keeps all of its lines.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+LOGGER_NAME = "service"
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+_lock = threading.Lock()
+_pipeline = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Format a record as a single line of JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "request", {}))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    """Attach the current request to each record and drop records of unsampled requests"""
+
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        if record.levelno < logging.WARNING and not _sampled(self.sample_rates):
+            return False
+        record.request = {"method": request.method, "path": request.path, "endpoint": request.endpoint}
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records, and counts them, rather than wait for a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments and render the traceback now, while they are still valid,
+        # and leave the JSON formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StderrHandler(logging.StreamHandler):
+    """Stream handler writing to whatever sys.stderr is when each record is written"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+class _Pipeline:
+    """The queue, its handler on the service logger, and the thread that drains it"""
+
+    def __init__(self, stream, level, sample_rates, queue_size):
+        self.queue_size = queue_size
+        self.queue = queue.Queue(queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(RequestFilter(sample_rates))
+        self.output = logging.StreamHandler(stream) if stream is not None else StderrHandler()
+        self.output.setFormatter(JSONFormatter())
+        self.listener = QueueListener(self.queue, self.output)
+        self.level = level
+
+    def start(self):
+        """Attach the handler and start the writer thread"""
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(self.level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        self.listener.start()
+
+    def stop(self):
+        """Write out the records still queued, then detach"""
+        self.listener.stop()
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.removeHandler(self.handler)
+        logger.propagate = True
+
+    def restart_writer(self):
+        """Start a new queue and writer thread in a forked child, where the parent's thread does not exist"""
+        self.queue = self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = QueueListener(self.queue, self.output)
+        self.listener.start()
+
+
+def configure_logging(app, stream=None):
+    """Send the service's log records through the JSON queue pipeline, replacing any earlier setup"""
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+        _pipeline = _Pipeline(stream, app.config['LOG_LEVEL'], app.config['LOG_SAMPLE_RATES'],
+                              app.config['LOG_QUEUE_SIZE'])
+        _pipeline.start()
+
+
+def flush_logs():
+    """Block until every queued record has been written"""
+    if _pipeline is not None:
+        _pipeline.queue.join()
+
+
+def _sampled(sample_rates):
+    """Return whether this request's records are kept, deciding once per request"""
+    sampled = g.get("log_sampled")
+    if sampled is None:
+        rate = sample_rates.get(request.endpoint, 1.0)
+        sampled = g.log_sampled = rate >= 1.0 or random.random() < rate
+    return sampled
+
+
+def _after_fork():
+    """Restart the writer thread in a worker forked after logging was configured"""
+    if _pipeline is not None:
+        _pipeline.restart_writer()
+
+
+def stop_logging():
+    """Write out the queued records and detach the pipeline from the service logger"""
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+atexit.register(stop_logging)
@@ -0,0 +1,96 @@
+"""
+Prometheus Metrics
+
+Request hooks that record per-route latency histograms and in-flight requests,
+plus gauges for database pool usage and account cache hits. Pool and cache
+gauges are sampled as each request starts, which includes every scrape.
+
+Under gunicorn every worker is a separate process with its own counters. When
+``PROMETHEUS_MULTIPROC_DIR`` is set before this module is imported, each
+process writes its samples to files in that directory and ``/metrics``
+aggregates all of them, whichever worker answers the scrape.
+"""
+import os
+import time
+from flask import g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from service.models import Account, db
+
+# Latency buckets in seconds, finer below 100 ms where most requests land
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request, up to the response being returned",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled",
+                           multiprocess_mode="livesum")
+DB_POOL_SIZE = Gauge("db_pool_size", "Connections the pool keeps open", multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Pool connections in use", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livesum")
+CACHE_HITS = Gauge("account_cache_hits", "Account cache hits since the process started",
+                   multiprocess_mode="livesum")
+CACHE_MISSES = Gauge("account_cache_misses", "Account cache misses since the process started",
+                     multiprocess_mode="livesum")
+CACHE_SIZE = Gauge("account_cache_size", "Entries in the account cache", multiprocess_mode="livesum")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def init_metrics(app):
+    """Instrument every request handled by app"""
+    app.before_request(_start_timer)
+    app.after_request(_observe_latency)
+    app.teardown_request(_end_request)
+
+
+def render():
+    """Return the current metrics in the Prometheus text format, with their content type"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _start_timer():
+    """Note when the request started and sample the pool and cache gauges"""
+    g.metrics_start = time.perf_counter()
+    g.metrics_in_flight = True
+    REQUESTS_IN_FLIGHT.inc()
+    _sample_pool()
+    _sample_cache()
+
+
+def _observe_latency(response):
+    """Record the request's latency under its route template and status code"""
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - start)
+    return response
+
+
+def _end_request(exc):
+    """Stop counting the request as in flight, however it ended"""
+    if g.pop("metrics_in_flight", False):
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def _sample_pool():
+    """Copy the engine's pool counters into gauges, for pools that keep them"""
+    pool = db.engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_SIZE.set(pool.size())
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def _sample_cache():
+    """Copy the account cache counters into gauges"""
+    stats = Account.cache.stats()
+    CACHE_HITS.set(stats["hits"])
+    CACHE_MISSES.set(stats["misses"])
+    CACHE_SIZE.set(stats["size"])
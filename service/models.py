@@ -1,11 +1,24 @@
 """
 Account Model
 """
+import hashlib
+import sys
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from itertools import chain
+from sqlalchemy import collate, delete, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, make_transient_to_detached
+from service.cache import NullCache
 
 db = SQLAlchemy()
 
+# Columns a client may write
+ACCOUNT_FIELDS = ("name", "email", "address", "phone_number")
+
+# Fields of the serialized account
+SERIALIZED_FIELDS = ("id",) + ACCOUNT_FIELDS + ("date_joined",)
+
 
 class Account(db.Model):
     """
@@ -18,7 +31,20 @@ class Account(db.Model):
     email = db.Column(db.String(120), nullable=False, unique=True)
     address = db.Column(db.String(200), nullable=True)
     phone_number = db.Column(db.String(20), nullable=True)
-    date_joined = db.Column(db.DateTime, default=datetime.utcnow)
+    date_joined = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __table_args__ = (
+        # Email lookups ignore case, so they are served by an index on lower(email)
+        db.Index("ix_accounts_email_lower", func.lower(email)),
+        # Name prefixes compare byte-wise: SQLite does by default, PostgreSQL needs the "C" collation
+        db.Index("ix_accounts_name", name).ddl_if(dialect="sqlite"),
+        db.Index("ix_accounts_name_c", collate(name, "C")).ddl_if(dialect="postgresql"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    # Read-through cache for find(), replaced by create_app() when enabled
+    cache = NullCache()
 
     def __repr__(self):
         return f'<Account {self.name}>'
@@ -34,6 +60,11 @@ class Account(db.Model):
             'date_joined': self.date_joined.isoformat() if self.date_joined else None
         }
 
+    @property
+    def etag(self):
+        """Strong entity tag identifying this version of the account"""
+        return make_etag(self.id, self.version)
+
     def deserialize(self, data):
         """Deserialize account from a dictionary"""
         try:
@@ -66,12 +97,287 @@ class Account(db.Model):
         """Return all accounts"""
         return cls.query.all()
 
+    @classmethod
+    def page_values(cls, after_id=0, limit=100, fields=None, criteria=()):
+        """Return up to limit accounts after after_id as column mappings, without building ORM objects"""
+        if after_id:
+            criteria = (cls.id > after_id, *criteria)
+        statement = select(*cls._columns(fields)).where(*criteria).order_by(cls.id).limit(limit)
+        return db.session.execute(statement).mappings().all()
+
+    @classmethod
+    def stream_values(cls, batch_size=1000, fields=None, criteria=()):
+        """Yield all accounts ordered by id as column mappings, fetching batch_size rows at a time"""
+        statement = select(*cls._columns(fields)).where(*criteria).order_by(cls.id)
+        yield from db.session.execute(statement.execution_options(yield_per=batch_size)).mappings()
+
+    @classmethod
+    def search_criteria(cls, email=None, name_prefix=None, joined_after=None, joined_before=None):
+        """Return WHERE clauses for the search filters, each one answerable from an index
+
+        The email match ignores case, the name prefix match is case-sensitive and
+        compares code points on every database, joined_after is inclusive and
+        joined_before is exclusive.
+        """
+        criteria = []
+        if email is not None:
+            criteria.append(func.lower(cls.email) == email.lower())
+        if name_prefix:
+            # A range instead of LIKE, so that a plain index on name can be used
+            name = cls.name
+            if db.session.get_bind().dialect.name == "postgresql":
+                name = collate(name, "C")
+            criteria.append(name >= name_prefix)
+            upper_bound = _prefix_upper_bound(name_prefix)
+            if upper_bound is not None:
+                criteria.append(name < upper_bound)
+        if joined_after is not None:
+            criteria.append(cls.date_joined >= joined_after)
+        if joined_before is not None:
+            criteria.append(cls.date_joined < joined_before)
+        return criteria
+
+    @classmethod
+    def _columns(cls, fields=None):
+        """Return the columns to select for fields, always including id and version"""
+        if fields is None:
+            return list(cls.__table__.columns)
+        return [cls.__table__.c[name] for name in dict.fromkeys(("id", "version") + tuple(fields))]
+
     @classmethod
     def find(cls, account_id):
-        """Find account by ID"""
-        return cls.query.get(account_id)
+        """Find account by ID, consulting the cache first"""
+        values = cls.cache.get(account_id)
+        if values is not None:
+            return cls._from_cache(values)
+        generation = cls.cache.generation(account_id)
+        account = db.session.get(cls, account_id)
+        if account is not None and account not in db.session.dirty:
+            values = {column.key: getattr(account, column.key) for column in cls.__table__.columns}
+            cls.cache.set(account_id, values, generation)
+        return account
+
+    @classmethod
+    def find_values(cls, account_id, fields=None):
+        """Find an account's column values by ID without building an ORM object
+
+        Only full rows are cached; a miss for a subset of fields selects just those columns.
+        """
+        values = cls.cache.get(account_id)
+        if values is None:
+            generation = cls.cache.generation(account_id)
+            statement = select(*cls._columns(fields)).where(cls.id == account_id)
+            row = db.session.execute(statement).mappings().first()
+            if row is None:
+                return None
+            values = dict(row)
+            if fields is None:
+                cls.cache.set(account_id, values, generation)
+        return values
+
+    @classmethod
+    def exists(cls, account_id):
+        """Return True if an account with this ID exists, asking the database rather than the cache"""
+        return db.session.scalar(select(cls.id).where(cls.id == account_id)) is not None
+
+    @classmethod
+    def find_many_values(cls, account_ids, fields=None, chunk_size=500):
+        """Find the column values of many accounts by ID, returned as a dict keyed by id
+
+        Cached rows are used as they are, and the rest are selected with one IN query per chunk_size ids.
+        """
+        found = {}
+        misses = {}
+        for account_id in account_ids:
+            values = cls.cache.get(account_id)
+            if values is None:
+                misses[account_id] = cls.cache.generation(account_id)
+            else:
+                found[account_id] = values
+        columns = cls._columns(fields)
+        missing_ids = list(misses)
+        for start in range(0, len(missing_ids), chunk_size):
+            statement = select(*columns).where(cls.id.in_(missing_ids[start:start + chunk_size]))
+            for row in db.session.execute(statement).mappings():
+                values = dict(row)
+                found[values['id']] = values
+                if fields is None:
+                    cls.cache.set(values['id'], values, misses[values['id']])
+        return found
+
+    @classmethod
+    def update_values(cls, account_id, values, version=None):
+        """Update the given columns of an account in one statement, returning its new column values or None
+
+        When version is given the account is only updated if it is still at that version.
+        """
+        table = cls.__table__
+        condition = [table.c.id == account_id]
+        if version is not None:
+            condition.append(table.c.version == version)
+        statement = (
+            update(table)
+            .where(*condition)
+            .values(**values, version=table.c.version + 1)
+            .returning(*table.c)
+            .execution_options(account_ids=(account_id,))
+        )
+        row = db.session.execute(statement).mappings().first()
+        db.session.commit()
+        return dict(row) if row else None
+
+    @classmethod
+    def upsert_by_email(cls, email, values):
+        """Insert an account, or update the one holding email, in one statement and return its column values
+
+        A freshly inserted account comes back at version 1, an updated one at a later version.
+        """
+        table = cls.__table__
+        dialect = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+        statement = (
+            dialect.insert(table)
+            .values(**values, email=email)
+            .on_conflict_do_update(index_elements=[table.c.email], set_={**values, "version": table.c.version + 1})
+            .returning(*table.c)
+        )
+        row = dict(db.session.execute(statement).mappings().one())
+        _mark_stale(db.session, [row["id"]])
+        db.session.commit()
+        return row
+
+    @classmethod
+    def delete_values(cls, account_id, version=None):
+        """Delete an account in one statement, returning True if it was deleted
+
+        When version is given the account is only deleted if it is still at that version.
+        """
+        table = cls.__table__
+        condition = [table.c.id == account_id]
+        if version is not None:
+            condition.append(table.c.version == version)
+        statement = delete(table).where(*condition).returning(table.c.id).execution_options(account_ids=(account_id,))
+        deleted = db.session.execute(statement).first() is not None
+        db.session.commit()
+        return deleted
+
+    @classmethod
+    def _from_cache(cls, values):
+        """Attach a cached account to the session without querying the database"""
+        account = cls(**values)
+        make_transient_to_detached(account)
+        return db.session.merge(account, load=False)
 
     @classmethod
     def find_by_email(cls, email):
         """Find account by email"""
         return cls.query.filter_by(email=email).first()
+
+
+def _prefix_upper_bound(prefix):
+    """Return the smallest string greater than every string starting with prefix, if there is one"""
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+def make_etag(account_id, version, fields=None):
+    """Return the entity tag for an account version, or for a subset of its fields"""
+    if fields is None:
+        return f"{account_id}-{version}"
+    return f"{account_id}-{version};{','.join(fields)}"
+
+
+def page_etag(limit, versions, fields=None):
+    """Return the entity tag for a page of accounts given their (id, version) pairs"""
+    digest = hashlib.sha1(f"{limit}:{','.join(fields or ())}:".encode())
+    for account_id, version in versions:
+        digest.update(f"{make_etag(account_id, version)},".encode())
+    return digest.hexdigest()
+
+
+def serialize_values(values, fields=None):
+    """Serialize a mapping of account column values exactly like Account.serialize()
+
+    When fields is given only those fields are included.
+    """
+    if fields is not None:
+        result = {field: values[field] for field in fields}
+        if result.get('date_joined'):
+            result['date_joined'] = result['date_joined'].isoformat()
+        return result
+    date_joined = values['date_joined']
+    return {
+        'id': values['id'],
+        'name': values['name'],
+        'email': values['email'],
+        'address': values['address'],
+        'phone_number': values['phone_number'],
+        'date_joined': date_joined.isoformat() if date_joined else None
+    }
+
+
+def parse_etag(etag):
+    """Return the (id, version) encoded in an entity tag, or None if it is not one of ours"""
+    account_id, _, version = etag.partition(";")[0].partition("-")
+    if not (account_id.isdigit() and version.isdigit()):
+        return None
+    return int(account_id), int(version)
+
+
+def is_unique_violation(error):
+    """Return True when an IntegrityError was raised by a unique constraint"""
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code == "23505" or "UNIQUE constraint failed" in str(error.orig)
+
+
+def _mark_stale(session, account_ids=None):
+    """Invalidate cached accounts now and again once the transaction commits"""
+    stale = session.info.setdefault("stale_accounts", set())
+    if account_ids is None:
+        stale.add(None)
+        Account.cache.clear()
+        return
+    for account_id in account_ids:
+        stale.add(account_id)
+        Account.cache.invalidate(account_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session, flush_context):
+    """Invalidate accounts changed or deleted through the unit of work"""
+    changed = [obj.id for obj in chain(session.dirty, session.deleted) if isinstance(obj, Account)]
+    if changed:
+        _mark_stale(session, changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk(orm_execute_state):
+    """Invalidate cached accounts on UPDATE or DELETE statements
+
+    Statements that name the accounts they touch in an account_ids execution option
+    only invalidate those; any other statement invalidates every cached account.
+    """
+    # Match on the table name: entity_description raises for a Core statement on the table that
+    # is routed through the ORM because its WHERE clause uses mapped attributes
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            getattr(orm_execute_state.statement.table, "name", None) == Account.__tablename__:
+        _mark_stale(orm_execute_state.session, orm_execute_state.execution_options.get("account_ids"))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_finished(session):
+    """Invalidate again when the transaction ends so nothing read mid-transaction survives"""
+    stale = session.info.pop("stale_accounts", set())
+    if None in stale:
+        Account.cache.clear()
+        return
+    for account_id in stale:
+        Account.cache.invalidate(account_id)
+
+
+@event.listens_for(Account.__table__, "after_drop")
+def _clear_dropped(target, connection, **kw):
+    """Empty the cache when the accounts table is dropped"""
+    Account.cache.clear()
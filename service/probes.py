@@ -0,0 +1,110 @@
+"""
+Liveness and Readiness Probes
+
+WSGI middleware placed in front of the Flask app. ``/health`` is answered
+without entering Flask at all. ``/ready`` checks that the database answers and
+that the connection pool still has room, and caches the verdict for
+``READINESS_CACHE_SECONDS`` so that however many probes arrive, each process
+touches the database at most once per interval. A failed check is logged and
+answered with nothing but its status. The security and CORS headers are added
+by the header layer in front of this one, as for every other response.
+"""
+import json
+import threading
+import time
+from sqlalchemy.exc import SQLAlchemyError
+from service import status
+from service.models import db
+
+
+def _dumps(body):
+    """Encode a probe body exactly like Flask's JSON responses: sorted, compact and newline-terminated"""
+    return (json.dumps(body, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+HEALTH_BODY = _dumps({"status": "healthy"})
+# Why a check failed is logged, not sent to whoever can reach the probe
+UNAVAILABLE = {"status": "unavailable"}
+PROBE_METHODS = ("GET", "HEAD")
+_STATUS_LINES = {status.HTTP_200_OK: "200 OK", status.HTTP_503_SERVICE_UNAVAILABLE: "503 Service Unavailable"}
+_BASE_HEADERS = [("Content-Type", "application/json"), ("Cache-Control", "no-store")]
+
+
+class ReadinessCheck:
+    """Database connectivity and pool saturation, re-checked at most once per interval"""
+
+    def __init__(self, app, interval, clock=time.monotonic):
+        self.app = app
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._engine = None
+        self._expires = 0.0
+        self._result = None
+
+    def __call__(self):
+        """Return (status code, report), from the cache while it is fresh"""
+        with self._lock:
+            if self._result is None or self._clock() >= self._expires:
+                self._result = self._check()
+                self._expires = self._clock() + self.interval
+            return self._result
+
+    def _check(self):
+        """Run the checks and build the report"""
+        if self._engine is None:
+            with self.app.app_context():
+                self._engine = db.engine
+        pool = pool_stats(self._engine.pool)
+        if pool.get("saturated"):
+            # Asking the pool for a connection now would wait for the pool timeout
+            self.app.logger.warning("Not ready: connection pool exhausted %s", pool)
+            return status.HTTP_503_SERVICE_UNAVAILABLE, UNAVAILABLE
+        try:
+            with self._engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+        except SQLAlchemyError:
+            self.app.logger.warning("Not ready: database check failed", exc_info=True)
+            return status.HTTP_503_SERVICE_UNAVAILABLE, UNAVAILABLE
+        return status.HTTP_200_OK, {"status": "ready", "database": "ok", "pool": pool}
+
+
+def pool_stats(pool):
+    """Return the pool's counters, for pools that keep them"""
+    if not hasattr(pool, "checkedout"):
+        return {"class": type(pool).__name__}
+    size, checked_out, overflow = pool.size(), pool.checkedout(), pool.overflow()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    return {
+        "class": type(pool).__name__,
+        "size": size,
+        "checked_out": checked_out,
+        "overflow": max(overflow, 0),
+        "max_overflow": max_overflow,
+        "saturated": max_overflow >= 0 and checked_out >= size + max_overflow,
+    }
+
+
+class ProbeMiddleware:
+    """Answer /health and /ready in front of a WSGI app, passing every other request through"""
+
+    def __init__(self, app, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.readiness = ReadinessCheck(app, app.config['READINESS_CACHE_SECONDS'])
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO")
+        if environ.get("REQUEST_METHOD") in PROBE_METHODS:
+            if path == "/health":
+                return self._respond(environ, start_response, status.HTTP_200_OK, HEALTH_BODY)
+            if path == "/ready":
+                code, report = self.readiness()
+                return self._respond(environ, start_response, code, _dumps(report))
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _respond(environ, start_response, code, body):
+        """Send a JSON probe response"""
+        headers = _BASE_HEADERS + [("Content-Length", str(len(body)))]
+        start_response(_STATUS_LINES[code], headers)
+        return [] if environ["REQUEST_METHOD"] == "HEAD" else [body]
@@ -0,0 +1,155 @@
+"""
+SQL Query Tracking
+
+Cursor events on the engine count and time every statement. The totals for
+each request are added to the response as ``X-Query-Count`` and
+``Server-Timing`` headers when ``QUERY_COUNT_HEADER`` is set. Statements slower
+than ``SLOW_QUERY_MS`` are logged with the database's plan for them and the
+number of their parameters, but not the parameter values.
+
+``track_queries`` and ``assert_max_queries`` collect the same figures around any
+block of code, so tests can hold each endpoint to a query budget.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from flask import current_app, g
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_EXPLAIN = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+_SAVEPOINT = "explain_slow_query"
+
+_tracker = contextvars.ContextVar("query_tracker", default=None)
+
+
+class QueryTracker:
+    """Statements executed while the tracker is active, and their total time"""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.statements = []
+        self.elapsed = 0.0
+
+    @property
+    def count(self):
+        """Number of statements executed"""
+        return len(self.statements)
+
+    def record(self, statement, elapsed):
+        """Add a statement to this tracker and every tracker around it"""
+        tracker = self
+        while tracker is not None:
+            tracker.statements.append(statement)
+            tracker.elapsed += elapsed
+            tracker = tracker.parent
+
+
+@contextmanager
+def track_queries():
+    """Collect the statements executed inside the block, including those of nested trackers"""
+    tracker = QueryTracker(_tracker.get())
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+@contextmanager
+def assert_max_queries(budget):
+    """Fail if the block executes more than budget statements"""
+    with track_queries() as tracker:
+        yield tracker
+    if tracker.count > budget:
+        listing = "\n".join(f"  {statement}" for statement in tracker.statements)
+        raise AssertionError(f"{tracker.count} queries executed, budget is {budget}:\n{listing}")
+
+
+def init_query_tracking(app, engine):
+    """Count and time the statements of every request served by app on engine"""
+    threshold = app.config['SLOW_QUERY_MS']
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_start
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.record(statement, elapsed)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            _log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+    app.before_request(_start_request)
+    app.after_request(_add_headers)
+    app.teardown_request(_end_request)
+
+
+def _start_request():
+    """Start counting the request's statements"""
+    g.query_tracker = QueryTracker(_tracker.get())
+    _tracker.set(g.query_tracker)
+
+
+def _add_headers(response):
+    """Report the request's statement count and time, when enabled"""
+    tracker = g.get("query_tracker")
+    if tracker is not None and current_app.config['QUERY_COUNT_HEADER']:
+        response.headers["X-Query-Count"] = str(tracker.count)
+        response.headers["Server-Timing"] = f'db;dur={tracker.elapsed * 1000:.2f};desc="{tracker.count} queries"'
+    return response
+
+
+def _end_request(exc):
+    """Stop counting once the request is over"""
+    tracker = g.pop("query_tracker", None)
+    if tracker is not None:
+        _tracker.set(tracker.parent)
+
+
+def _log_slow_query(conn, statement, parameters, executemany, elapsed):
+    """Log a slow statement with the plan the database chose for it
+
+    Only the number of bound parameters is logged, never their values, which may be personal data.
+    """
+    size = len(parameters) if parameters else 0
+    shape = f"{size} rows" if executemany else f"{size} parameters"
+    logger.warning("Slow query (%.1f ms, %s): %s\n%s", elapsed * 1000, shape, statement,
+                   "" if executemany else explain(conn, statement, parameters))
+
+
+def explain(conn, statement, parameters):
+    """Return the database's plan for a statement, or an empty string when it cannot be explained
+
+    On PostgreSQL a failed statement aborts the transaction it runs in, so the plan is
+    taken inside a savepoint that is rolled back on failure, leaving the caller's
+    transaction as it was.
+    """
+    prefix = _EXPLAIN.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return ""
+    savepoint = False
+    # A separate DBAPI cursor, so the plan is neither counted nor timed as a query
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.name == "postgresql":
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+            savepoint = True
+        cursor.execute(prefix + statement, parameters)
+        plan = "\n".join(" ".join(str(value) for value in row) for row in cursor.fetchall())
+        if savepoint:
+            cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+        return plan
+    except conn.dialect.loaded_dbapi.Error as error:
+        if savepoint:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+        # The message may quote parameter values, so only its type is reported
+        return f"(no plan: {type(error).__name__})"
+    finally:
+        cursor.close()
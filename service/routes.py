@@ -1,24 +1,80 @@
 """
 Account Service Routes
 """
-from flask import Flask, request, abort
-from service.models import Account, db
+import json
+import os
+from datetime import datetime, timezone
+from flask import Flask, Response, request, abort, make_response, send_file, url_for, stream_with_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from service.models import (ACCOUNT_FIELDS, SERIALIZED_FIELDS, Account, db, is_unique_violation, make_etag, page_etag,
+                            parse_etag, serialize_values)
+from service.encoding import FastJSONProvider
+from service.cache import LRUCache, NullCache
+from service.config import apply_sqlite_pragmas, database_uri, engine_options
+from service.bulk import BulkConflictError, apply_operations
+from service.search import search_terms, search_values
+from service.cli import accounts_cli
+from service import exports
+from service import metrics
+from service.queries import init_query_tracking
+from service.compression import init_compression
+from service.logs import configure_logging
+from service.probes import ProbeMiddleware
 from service import status
 
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
 
-def create_app():
-    """Create and configure the Flask app"""
+
+def create_app(config=None):
+    """Create and configure the Flask app, applying any config overrides"""
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///accounts.db'
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.environ)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DEFAULT_PAGE_SIZE'] = 100
+    app.config['MAX_PAGE_SIZE'] = 1000
+    app.config['STREAM_BATCH_SIZE'] = 1000
+    app.config['BULK_MAX_OPERATIONS'] = 10000
+    app.config['BATCH_GET_MAX_IDS'] = 1000
+    app.config['BATCH_GET_CHUNK_SIZE'] = 500
+    app.config['EXPORT_DIR'] = os.environ.get("EXPORT_DIR") or None
+    app.config['EXPORT_WORKERS'] = 2
+    app.config['EXPORT_COMPRESSLEVEL'] = 6
+    app.config['EXPORT_HEARTBEAT_SECONDS'] = 10
+    app.config['ACCOUNT_CACHE_SIZE'] = int(os.environ.get("ACCOUNT_CACHE_SIZE", 0))
+    app.config['ACCOUNT_CACHE_TTL'] = float(os.environ.get("ACCOUNT_CACHE_TTL", 30))
+    app.config['SLOW_QUERY_MS'] = 100
+    app.config['QUERY_COUNT_HEADER'] = False
+    app.config['LOG_LEVEL'] = os.environ.get("LOG_LEVEL", "INFO")
+    app.config['LOG_SAMPLE_RATES'] = {}
+    app.config['LOG_QUEUE_SIZE'] = 10000
+    app.config['READINESS_CACHE_SECONDS'] = 2
+    app.config['COMPRESSION_MIN_SIZE'] = 1024
+    app.config['COMPRESSION_LEVELS'] = {"zstd": 3, "br": 4, "gzip": 6}
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI'], os.environ))
 
+    configure_logging(app)
     db.init_app(app)
-
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", apply_sqlite_pragmas)
+        init_query_tracking(app, db.engine)
+    if app.config['ACCOUNT_CACHE_SIZE']:
+        Account.cache = LRUCache(app.config['ACCOUNT_CACHE_SIZE'], app.config['ACCOUNT_CACHE_TTL'])
+    else:
+        Account.cache = NullCache()
 
     # Register routes
+    metrics.init_metrics(app)
+    init_compression(app)
     register_routes(app)
+    app.cli.add_command(accounts_cli)
+    app.wsgi_app = ProbeMiddleware(app, app.wsgi_app)
 
     return app
 
@@ -26,7 +82,11 @@ def create_app():
 def register_routes(app):
     """Register all routes with the Flask app"""
     _register_account_routes(app)
+    _register_search_routes(app)
+    _register_bulk_routes(app)
+    _register_export_routes(app)
     _register_utility_routes(app)
+    _register_error_handlers(app)
 
 
 def _register_account_routes(app):
@@ -39,51 +99,375 @@ def _register_account_routes(app):
         account.deserialize(request.get_json())
         account.save()
         app.logger.info("Account with ID [%s] saved.", account.id)
-        return account.serialize(), status.HTTP_201_CREATED
+        return _tagged_response(account.etag, account.serialize(), status.HTTP_201_CREATED)
 
     @app.route("/accounts", methods=["GET"])
     def list_accounts():
-        """Returns all of the Accounts"""
+        """Returns a page of Accounts ordered by id, or the Accounts listed in ids"""
         app.logger.info("Request to list Accounts")
-        accounts = Account.all()
-        results = [account.serialize() for account in accounts]
-        app.logger.info("Returning %d accounts", len(results))
-        return results, status.HTTP_200_OK
+        if "ids" in request.args:
+            return _batch_get(app, _ids_arg())
+        return _stream_accounts(app) if _wants_ndjson() else _list_page(app)
 
     @app.route("/accounts/<int:account_id>", methods=["GET"])
     def get_accounts(account_id):
         """Retrieve a single Account"""
         app.logger.info("Request to retrieve Account with id: %s", account_id)
-        account = Account.find(account_id)
-        if not account:
+        fields = _fields_arg()
+        values = Account.find_values(account_id, fields)
+        if not values:
             abort(status.HTTP_404_NOT_FOUND, f"Account with id '{account_id}' was not found.")
-        app.logger.info("Returning account: %s", account.name)
-        return account.serialize(), status.HTTP_200_OK
+        app.logger.info("Returning account: %s", account_id)
+        etag = make_etag(account_id, values['version'], fields)
+        return _conditional_response(etag, lambda: serialize_values(values, fields))
 
     @app.route("/accounts/<int:account_id>", methods=["PUT"])
     def update_accounts(account_id):
         """Update an Account"""
         app.logger.info("Request to update Account with id: %s", account_id)
-        account = Account.find(account_id)
-        if not account:
-            abort(status.HTTP_404_NOT_FOUND, f"Account with id '{account_id}' was not found.")
-        account.deserialize(request.get_json())
-        account.id = account_id
-        account.save()
-        app.logger.info("Account with ID [%s] updated.", account.id)
-        return account.serialize(), status.HTTP_200_OK
+        values = _update_account(account_id, _replacement_values(request.get_json()))
+        app.logger.info("Account with ID [%s] updated.", account_id)
+        return _tagged_response(make_etag(account_id, values['version']), serialize_values(values))
+
+    @app.route("/accounts/<int:account_id>", methods=["PATCH"])
+    def patch_accounts(account_id):
+        """Update some fields of an Account"""
+        app.logger.info("Request to patch Account with id: %s", account_id)
+        values = _update_account(account_id, _patch_values(request.get_json()))
+        app.logger.info("Account with ID [%s] patched.", account_id)
+        return _tagged_response(make_etag(account_id, values['version']), serialize_values(values))
+
+    @app.route("/accounts/by-email/<email>", methods=["PUT"])
+    def upsert_accounts(email):
+        """Create or replace the Account with this email"""
+        app.logger.info("Request to upsert Account with email: %s", email)
+        values = Account.upsert_by_email(email, _upsert_values(email, request.get_json()))
+        created = values['version'] == 1
+        app.logger.info("Account with ID [%s] %s.", values['id'], "created" if created else "updated")
+        response = _tagged_response(make_etag(values['id'], values['version']), serialize_values(values),
+                                    status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        response.headers["Location"] = url_for("get_accounts", account_id=values['id'])
+        return response
 
     @app.route("/accounts/<int:account_id>", methods=["DELETE"])
     def delete_accounts(account_id):
         """Delete an Account"""
         app.logger.info("Request to delete Account with id: %s", account_id)
-        account = Account.find(account_id)
-        if account:
-            account.delete()
-            app.logger.info("Account with ID [%s] delete complete.", account_id)
+        _delete_account(app, account_id)
         return "", status.HTTP_204_NO_CONTENT
 
 
+def _register_search_routes(app):
+    """Register full-text search routes"""
+    @app.route("/accounts/search", methods=["GET"])
+    def search_accounts():
+        """Returns a ranked page of Accounts whose name or address matches q"""
+        terms = search_terms(request.args.get("q", ""))
+        if not terms:
+            abort(status.HTTP_400_BAD_REQUEST, "q must contain at least one word.")
+        offset, limit = _offset_args(app)
+        fields = _fields_arg()
+        rows = search_values(terms, limit, offset, fields)
+        headers = {}
+        if len(rows) == limit:
+            next_url = url_for("search_accounts", **{**request.args.to_dict(), "limit": limit, "offset": offset + limit})
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        app.logger.info("Search returned %d accounts", len(rows))
+        return [serialize_values(row, fields) for row in rows], status.HTTP_200_OK, headers
+
+
+def _register_bulk_routes(app):
+    """Register bulk account routes"""
+    @app.route("/accounts/_bulk", methods=["POST"])
+    def bulk_accounts():
+        """Apply a batch of create/update/delete operations in one transaction"""
+        operations = request.get_json()
+        if not isinstance(operations, list):
+            abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON array of operations.")
+        if len(operations) > app.config['BULK_MAX_OPERATIONS']:
+            abort(status.HTTP_400_BAD_REQUEST,
+                  f"A bulk request may contain at most {app.config['BULK_MAX_OPERATIONS']} operations.")
+        app.logger.info("Request to apply %d bulk operations", len(operations))
+        try:
+            results = apply_operations(operations)
+        except BulkConflictError as error:
+            app.logger.warning("Bulk request rolled back: %s", error)
+            abort(status.HTTP_409_CONFLICT, "Bulk request conflicted with a concurrent change; retry it.")
+        return results, status.HTTP_200_OK
+
+    @app.route("/accounts/_get", methods=["POST"])
+    def batch_get_accounts():
+        """Returns the Accounts whose ids are listed in the body, for lists too long for a query string"""
+        data = request.get_json()
+        ids = data.get("ids") if isinstance(data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+            abort(status.HTTP_400_BAD_REQUEST, 'Request body must be a JSON object with "ids", a list of account ids.')
+        return _batch_get(app, ids)
+
+
+def _register_export_routes(app):
+    """Register background export routes"""
+    @app.route("/accounts/exports", methods=["POST"])
+    def create_export():
+        """Start a background export of all Accounts"""
+        body = request.get_json(silent=True)
+        if body is None:
+            body = {}
+        if not isinstance(body, dict):
+            abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON object.")
+        file_format = body.get("format", "ndjson")
+        if file_format not in exports.EXPORT_FORMATS:
+            abort(status.HTTP_400_BAD_REQUEST, f"format must be one of {', '.join(exports.EXPORT_FORMATS)}.")
+        state = exports.start_export(app, file_format)
+        app.logger.info("Export %s queued", state["id"])
+        location = url_for("get_export", job_id=state["id"])
+        return state, status.HTTP_202_ACCEPTED, {"Location": location}
+
+    @app.route("/accounts/exports/<job_id>", methods=["GET"])
+    def get_export(job_id):
+        """Report export progress, or serve the file once it is complete"""
+        state = exports.load_state(app, job_id)
+        if not state:
+            abort(status.HTTP_404_NOT_FOUND, f"Export '{job_id}' was not found.")
+        if state["status"] in ("pending", "running"):
+            return state, status.HTTP_202_ACCEPTED
+        if state["status"] == "failed":
+            return state, status.HTTP_200_OK
+        return send_file(exports.export_path(app, state), mimetype="application/gzip", as_attachment=True,
+                         download_name=f"accounts-{job_id}.{state['format']}.gz")
+
+
+def _list_page(app):
+    """Return one keyset page of Accounts with a Link to the next page"""
+    after_id, limit = _page_args(app)
+    fields = _fields_arg()
+    rows = Account.page_values(after_id, limit, fields, _search_criteria())
+    headers = {}
+    if len(rows) == limit:
+        next_url = url_for("list_accounts", **{**request.args.to_dict(), "limit": limit, "after_id": rows[-1]['id']})
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    app.logger.info("Returning %d accounts", len(rows))
+    etag = page_etag(limit, [(row['id'], row['version']) for row in rows], fields)
+    return _conditional_response(etag, lambda: [serialize_values(row, fields) for row in rows], headers)
+
+
+def _batch_get(app, account_ids):
+    """Return the Accounts with the given ids in request order, and the ids that were not found"""
+    account_ids = list(dict.fromkeys(account_ids))
+    if not account_ids:
+        abort(status.HTTP_400_BAD_REQUEST, "ids must list at least one account id.")
+    if len(account_ids) > app.config['BATCH_GET_MAX_IDS']:
+        abort(status.HTTP_400_BAD_REQUEST, f"At most {app.config['BATCH_GET_MAX_IDS']} ids may be requested at once.")
+    fields = _fields_arg()
+    found = Account.find_many_values(account_ids, fields, app.config['BATCH_GET_CHUNK_SIZE'])
+    app.logger.info("Returning %d of %d requested accounts", len(found), len(account_ids))
+    return {
+        "accounts": [serialize_values(found[account_id], fields) for account_id in account_ids if account_id in found],
+        "missing": [account_id for account_id in account_ids if account_id not in found],
+    }, status.HTTP_200_OK
+
+
+def _replacement_values(data):
+    """Return the column values a PUT body replaces, with omitted fields cleared"""
+    if not isinstance(data, dict):
+        abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON object.")
+    return {field: data.get(field) for field in ACCOUNT_FIELDS}
+
+
+def _patch_values(data):
+    """Return the column values a PATCH body supplies"""
+    if not isinstance(data, dict):
+        abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON object.")
+    values = {field: data[field] for field in ACCOUNT_FIELDS if field in data}
+    if not values:
+        abort(status.HTTP_400_BAD_REQUEST, f"Request body must set at least one of {', '.join(ACCOUNT_FIELDS)}.")
+    return values
+
+
+def _upsert_values(email, data):
+    """Return the column values an upsert body sets, the email coming from the path"""
+    values = _replacement_values(data)
+    if values.pop("email") not in (None, email):
+        abort(status.HTTP_400_BAD_REQUEST, "The email in the body must match the email in the path.")
+    if not values["name"]:
+        abort(status.HTTP_400_BAD_REQUEST, "name is required.")
+    return values
+
+
+def _update_account(account_id, values):
+    """Update an Account in one statement, conditional on If-Match when given, and return its new values"""
+    version = _if_match_version(account_id)
+    updated = Account.update_values(account_id, values, version)
+    if updated is None:
+        if version is not None:
+            _abort_precondition_failed(account_id)
+        abort(status.HTTP_404_NOT_FOUND, f"Account with id '{account_id}' was not found.")
+    return updated
+
+
+def _delete_account(app, account_id):
+    """Delete an Account if it exists in one statement, conditional on If-Match when given"""
+    version = _if_match_version(account_id)
+    if Account.delete_values(account_id, version):
+        app.logger.info("Account with ID [%s] delete complete.", account_id)
+    elif version is not None:
+        _abort_precondition_failed(account_id)
+
+
+def _conditional_response(etag, build_body, headers=None):
+    """Answer 304 Not Modified when the client already holds etag, otherwise build the body"""
+    # Weak comparison, as compressed responses carry the weak form of etag
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = make_response(build_body(), status.HTTP_200_OK)
+    response.set_etag(etag)
+    response.headers.extend(headers or {})
+    return response
+
+
+def _tagged_response(etag, body, code=status.HTTP_200_OK):
+    """Return body with its entity tag"""
+    response = make_response(body, code)
+    response.set_etag(etag)
+    return response
+
+
+def _if_match_version(account_id):
+    """Return the version an If-Match header requires, or None when there is no precondition"""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    # Compression only weakens the tag of the same representation, so accept its weak form
+    for etag in request.if_match.as_set(include_weak=True):
+        parsed = parse_etag(etag)
+        if parsed and parsed[0] == account_id:
+            return parsed[1]
+    return 0
+
+
+def _abort_precondition_failed(account_id):
+    """Abort with 404 when the account is gone, otherwise with 412
+
+    The cache may still hold an account another worker deleted, so this asks the database.
+    """
+    if not Account.exists(account_id):
+        abort(status.HTTP_404_NOT_FOUND, f"Account with id '{account_id}' was not found.")
+    abort(status.HTTP_412_PRECONDITION_FAILED, f"Account with id '{account_id}' has been modified.")
+
+
+def _wants_ndjson():
+    """Return True when the client prefers newline-delimited JSON"""
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _stream_accounts(app):
+    """Stream every Account as one JSON document per line"""
+    batch_size = app.config['STREAM_BATCH_SIZE']
+    fields = _fields_arg()
+    criteria = _search_criteria()
+
+    def generate():
+        count = 0
+        for values in Account.stream_values(batch_size, fields, criteria):
+            count += 1
+            yield json.dumps(serialize_values(values, fields)) + "\n"
+        app.logger.info("Streamed %d accounts", count)
+
+    return Response(stream_with_context(generate()), status.HTTP_200_OK, mimetype=NDJSON_MIMETYPE)
+
+
+def _fields_arg():
+    """Parse the sparse fieldset query parameter, returning None when every field is wanted"""
+    if "fields" not in request.args:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in request.args["fields"].split(",") if name.strip()))
+    unknown = [name for name in fields if name not in SERIALIZED_FIELDS]
+    if not fields or unknown:
+        abort(status.HTTP_400_BAD_REQUEST, f"fields must be a comma-separated list of {', '.join(SERIALIZED_FIELDS)}.")
+    return fields
+
+
+def _ids_arg():
+    """Parse the comma-separated ids query parameter"""
+    try:
+        return [int(value) for value in request.args["ids"].split(",") if value.strip()]
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, "ids must be a comma-separated list of account ids.")
+
+
+def _search_criteria():
+    """Parse the search query parameters into WHERE clauses"""
+    return Account.search_criteria(
+        email=request.args.get("email"),
+        name_prefix=request.args.get("name_prefix"),
+        joined_after=_datetime_arg("joined_after"),
+        joined_before=_datetime_arg("joined_before"),
+    )
+
+
+def _datetime_arg(name):
+    """Parse an ISO 8601 date or datetime query parameter as naive UTC"""
+    if name not in request.args:
+        return None
+    text = request.args[name]
+    # datetime.fromisoformat only accepts a "Z" offset from Python 3.11
+    if text[-1:] in ("Z", "z"):
+        text = text[:-1] + "+00:00"
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, f"{name} must be an ISO 8601 date or datetime.")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _page_args(app):
+    """Parse the keyset pagination query parameters"""
+    try:
+        after_id = int(request.args.get("after_id", 0))
+        limit = int(request.args.get("limit", app.config['DEFAULT_PAGE_SIZE']))
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, "limit and after_id must be integers.")
+    if limit < 1:
+        abort(status.HTTP_400_BAD_REQUEST, "limit must be a positive integer.")
+    return after_id, min(limit, app.config['MAX_PAGE_SIZE'])
+
+
+def _offset_args(app):
+    """Parse the offset pagination query parameters of ranked results"""
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", app.config['DEFAULT_PAGE_SIZE']))
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, "limit and offset must be integers.")
+    if limit < 1 or offset < 0:
+        abort(status.HTTP_400_BAD_REQUEST, "limit must be positive and offset must not be negative.")
+    return offset, min(limit, app.config['MAX_PAGE_SIZE'])
+
+
+def _register_error_handlers(app):
+    """Register handlers for database errors"""
+    @app.errorhandler(StaleDataError)
+    def concurrent_update(error):
+        """Report a lost update race instead of a server error"""
+        db.session.rollback()
+        Account.cache.clear()
+        app.logger.warning("Concurrent update detected: %s", error)
+        return {"error": "Account was modified concurrently; retry the request."}, status.HTTP_409_CONFLICT
+
+    @app.errorhandler(IntegrityError)
+    def constraint_violation(error):
+        """Report a write rejected by a constraint as a client error instead of a server error"""
+        db.session.rollback()
+        if is_unique_violation(error):
+            app.logger.info("Duplicate account rejected: %s", error.orig)
+            return {"error": "An account with this email already exists."}, status.HTTP_409_CONFLICT
+        app.logger.info("Invalid account rejected: %s", error.orig)
+        return {"error": "Account is missing a required field."}, status.HTTP_400_BAD_REQUEST
+
+
 def _register_utility_routes(app):
     """Register utility routes"""
     @app.route("/")
@@ -93,12 +477,19 @@ def _register_utility_routes(app):
 
     @app.route("/health")
     def health_check():
-        """Health check endpoint"""
+        """Health check endpoint, normally answered by ProbeMiddleware before Flask sees it"""
         return {"status": "healthy"}, status.HTTP_200_OK
 
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """Prometheus metrics for every worker process"""
+        body, content_type = metrics.render()
+        return Response(body, status=status.HTTP_200_OK, content_type=content_type)
 
-# For backward compatibility, create app instance
-app = create_app()
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+def __getattr__(name):
+    """Keep ``from service.routes import app`` working by handing out the shared app built by the package"""
+    if name == "app":
+        from service import app  # imported here because the package imports this module
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,56 @@
+"""
+Database Schema
+
+Creates the accounts table, its indexes and the full-text search index, and
+applies the Alembic migrations in ``migrations/`` to databases that already
+exist. This is an explicit deployment step, run once with
+``flask --app service accounts init-db`` rather than on import, so that
+starting a worker never touches the database or loads Alembic.
+
+New migrations are written with Flask-Migrate's commands, for example
+``flask --app "service.schema:migration_app()" db revision -m "..."``.
+"""
+import os
+from sqlalchemy import inspect
+from service.models import db
+from service.search import install_search_index
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# The accounts table as create_all() made it before migrations were introduced
+BASELINE_REVISION = "0001"
+
+
+def init_migrations(app):
+    """Register Flask-Migrate and its ``flask db`` commands on app"""
+    from flask_migrate import Migrate  # Alembic is only needed by the deployment step
+
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+def migration_app():
+    """Create an app with the ``flask db`` commands, for writing and running migrations"""
+    from service.routes import create_app
+
+    app = create_app()
+    init_migrations(app)
+    return app
+
+
+def init_db(app):
+    """Create the schema on an empty database, or migrate an existing one to the latest revision"""
+    from flask_migrate import stamp, upgrade
+
+    if "migrate" not in app.extensions:
+        init_migrations(app)
+    with app.app_context():
+        tables = inspect(db.engine).get_table_names()
+        if "accounts" not in tables:
+            # An empty database gets the current schema directly
+            db.create_all()
+            stamp(revision="head")
+        elif "alembic_version" not in tables:
+            stamp(revision=BASELINE_REVISION)
+        upgrade()
+        with db.engine.begin() as connection:
+            install_search_index(connection)
@@ -0,0 +1,89 @@
+"""
+Account Full-Text Search
+
+A shadow full-text index over account names and addresses. On SQLite it is an
+FTS5 table that uses the accounts table as external content and is kept in
+sync by triggers, so bulk statements and the import CLI are covered as well as
+ORM writes. On PostgreSQL it is a GIN index over a tsvector expression, which
+the database maintains by itself.
+"""
+import re
+from sqlalchemy import column, event, select, table, text
+from service.models import Account, db
+
+# SQLite: FTS5 shadow table with two and three character prefix indexes for partial words
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE accounts_fts USING fts5(name, address, content='accounts', content_rowid='id', "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER accounts_fts_insert AFTER INSERT ON accounts BEGIN "
+    "INSERT INTO accounts_fts(rowid, name, address) VALUES (new.id, new.name, new.address); END",
+    "CREATE TRIGGER accounts_fts_delete AFTER DELETE ON accounts BEGIN "
+    "INSERT INTO accounts_fts(accounts_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+    "END",
+    "CREATE TRIGGER accounts_fts_update AFTER UPDATE OF name, address ON accounts BEGIN "
+    "INSERT INTO accounts_fts(accounts_fts, rowid, name, address) VALUES ('delete', old.id, old.name, old.address); "
+    "INSERT INTO accounts_fts(rowid, name, address) VALUES (new.id, new.name, new.address); END",
+    "INSERT INTO accounts_fts(accounts_fts) VALUES ('rebuild')",
+)
+
+# PostgreSQL: queries must repeat this exact expression for the index to be used
+_TSVECTOR = "to_tsvector('simple', coalesce(accounts.name, '') || ' ' || coalesce(accounts.address, ''))"
+_POSTGRES_DDL = f"CREATE INDEX IF NOT EXISTS ix_accounts_search ON accounts USING gin ({_TSVECTOR})"
+
+_fts = table("accounts_fts", column("rowid"), column("rank"), column("accounts_fts"))
+
+
+def install_search_index(connection):
+    """Create the full-text index if the database does not have it yet"""
+    if connection.dialect.name == "sqlite":
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'accounts_fts'").first()
+        if not exists:
+            for ddl in _SQLITE_DDL:
+                connection.exec_driver_sql(ddl)
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(_POSTGRES_DDL)
+
+
+def search_terms(query):
+    """Split a search query into the words to match"""
+    return re.findall(r"\w+", query)
+
+
+def search_values(terms, limit=100, offset=0, fields=None):
+    """Return accounts matching every term as a word prefix, best match first, as column mappings"""
+    columns = Account._columns(fields)
+    if db.session.get_bind().dialect.name == "sqlite":
+        # Rank and page inside the FTS table, then join only the rows of the page
+        matches = (
+            select(_fts.c.rowid, _fts.c.rank)
+            .where(_fts.c.accounts_fts.match(" ".join(f'"{term}"*' for term in terms)))
+            .order_by(_fts.c.rank, _fts.c.rowid)
+            .limit(limit)
+            .offset(offset)
+            .subquery()
+        )
+        statement = select(*columns).join(matches, matches.c.rowid == Account.id).order_by(matches.c.rank, Account.id)
+    else:
+        query = " & ".join(f"{term}:*" for term in terms)
+        statement = (
+            select(*columns)
+            .where(text(f"{_TSVECTOR} @@ to_tsquery('simple', :query)"))
+            .order_by(text(f"ts_rank({_TSVECTOR}, to_tsquery('simple', :query)) DESC"), Account.id)
+            .params(query=query)
+            .limit(limit)
+            .offset(offset)
+        )
+    return db.session.execute(statement).mappings().all()
+
+
+@event.listens_for(Account.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    """Index a newly created accounts table"""
+    install_search_index(connection)
+
+
+@event.listens_for(Account.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    """Drop the SQLite shadow table with the table it indexes"""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS accounts_fts")
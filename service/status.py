@@ -3,7 +3,12 @@ Status codes for HTTP responses
 """
 HTTP_200_OK = 200
 HTTP_201_CREATED = 201
+HTTP_202_ACCEPTED = 202
 HTTP_204_NO_CONTENT = 204
+HTTP_304_NOT_MODIFIED = 304
+HTTP_400_BAD_REQUEST = 400
 HTTP_404_NOT_FOUND = 404
 HTTP_405_METHOD_NOT_ALLOWED = 405
 HTTP_409_CONFLICT = 409
+HTTP_412_PRECONDITION_FAILED = 412
+HTTP_503_SERVICE_UNAVAILABLE = 503
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from service.routes import app
+    from service.schema import init_db
     
     print("🚀 Starting Account Service REST API Server...")
     print("📍 Server will be available at: http://127.0.0.1:5000")
@@ -43,6 +44,7 @@ try:
     print("="*60)
     
     # Start the Flask server
+    init_db(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
     
 except ImportError as e:
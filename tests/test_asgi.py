@@ -0,0 +1,203 @@
+"""
+Test cases for the ASGI Account Service
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from starlette.testclient import TestClient
+from service import app as flask_app
+from service import build_app, status
+from service.asgi import async_database_uri, create_asgi_app
+from service.models import db
+from service.routes import create_app
+from service.schema import init_db
+
+BASE_URL = "/accounts"
+
+# The same requests go to both apps, in this order
+PARITY_REQUESTS = [
+    ("POST", BASE_URL, {"json": {"name": "Parity", "email": "parity@example.com", "address": "1 Same St"}}),
+    ("POST", BASE_URL, {"json": {"name": "Twin", "email": "parity@example.com"}}),
+    ("POST", BASE_URL, {"json": {"email": "nameless@example.com"}}),
+    ("POST", BASE_URL, {"json": {"name": "Second", "email": "second@example.com"}}),
+    ("GET", f"{BASE_URL}/1", {}),
+    ("GET", f"{BASE_URL}/1", {"headers": {"If-None-Match": '"1-1"'}}),
+    ("GET", f"{BASE_URL}/99", {}),
+    ("GET", f"{BASE_URL}?limit=1", {}),
+    ("GET", f"{BASE_URL}?limit=0", {}),
+    ("GET", BASE_URL, {"headers": {"Accept": "application/x-ndjson"}}),
+    ("PUT", f"{BASE_URL}/1", {"json": {"name": "Renamed", "email": "parity@example.com"},
+                              "headers": {"If-Match": '"1-1"'}}),
+    ("PUT", f"{BASE_URL}/1", {"json": {"name": "Stale", "email": "parity@example.com"},
+                              "headers": {"If-Match": '"1-1"'}}),
+    ("PUT", f"{BASE_URL}/2", {"json": {"name": "Taken", "email": "parity@example.com"}}),
+    ("PUT", f"{BASE_URL}/99", {"json": {"name": "Ghost", "email": "ghost@example.com"}}),
+    ("DELETE", f"{BASE_URL}/1", {"headers": {"If-Match": '"1-1"'}}),
+    ("DELETE", f"{BASE_URL}/1", {}),
+    ("DELETE", f"{BASE_URL}/1", {}),
+    ("DELETE", f"{BASE_URL}/1", {"headers": {"If-Match": '"1-2"'}}),
+    ("PUT", f"{BASE_URL}/1", {"json": {"name": "Gone", "email": "gone@example.com"}, "headers": {"If-Match": '"1-2"'}}),
+    ("GET", f"{BASE_URL}/1", {}),
+]
+
+
+class TestAsgiAccountService(unittest.TestCase):
+    """Test Cases for the ASGI app"""
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        uri = f"sqlite:///{os.path.join(self.workdir.name, 'asgi.db')}"
+        self.schema_app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+        init_db(self.schema_app)
+        self.client = TestClient(create_asgi_app({"SQLALCHEMY_DATABASE_URI": uri}))
+        self.client.__enter__()
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.client.__exit__(None, None, None)
+        with self.schema_app.app_context():
+            db.engine.dispose()
+        self.workdir.cleanup()
+
+    def _create(self, name="Async", email="async@example.com"):
+        """Helper method to create an account"""
+        resp = self.client.post(BASE_URL, json={"name": name, "email": email, "address": "1 Loop Rd"})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        return resp
+
+    def test_crud(self):
+        """It should create, read, update and delete an Account"""
+        created = self._create()
+        account_id = created.json()["id"]
+        self.assertIsNotNone(created.json()["date_joined"])
+
+        resp = self.client.get(f"{BASE_URL}/{account_id}")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()["name"], "Async")
+
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Renamed", "email": "async@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()["name"], "Renamed")
+        self.assertNotEqual(resp.headers["ETag"], created.headers["ETag"])
+
+        resp = self.client.delete(f"{BASE_URL}/{account_id}")
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{account_id}").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.put(f"{BASE_URL}/{account_id}", json={}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_and_stream(self):
+        """It should page and stream Accounts like the Flask app"""
+        for i in range(3):
+            self._create(name=f"Async {i}", email=f"async{i}@example.com")
+        resp = self.client.get(f"{BASE_URL}?limit=2")
+        self.assertEqual(len(resp.json()), 2)
+        self.assertIn('rel="next"', resp.headers["Link"])
+        resp = self.client.get(f"{BASE_URL}?limit=2", headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        resp = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(len(resp.text.splitlines()), 3)
+        self.assertEqual(self.client.get(f"{BASE_URL}?limit=x").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_if_match(self):
+        """It should honor If-Match on PUT and DELETE"""
+        created = self._create()
+        account_id = created.json()["id"]
+        etag = created.headers["ETag"]
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "New", "email": "new@example.com"},
+                               headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Old", "email": "old@example.com"},
+                               headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        resp = self.client.delete(f"{BASE_URL}/{account_id}", headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_same_body_and_headers_as_flask(self):
+        """It should send the same body, security and CORS headers as the Flask app"""
+        flask_resp = flask_app.test_client().get("/", headers={"Origin": "http://example.com"})
+        resp = self.client.get("/", headers={"Origin": "http://example.com"})
+        self.assertEqual(resp.content, flask_resp.get_data())
+        for header in ("Access-Control-Allow-Origin", "Vary", "Permissions-Policy", "X-Frame-Options",
+                       "X-Content-Type-Options", "Content-Security-Policy", "Referrer-Policy"):
+            self.assertEqual(resp.headers.get(header), flask_resp.headers.get(header), header)
+        self.assertEqual(self.client.get("/health").headers["Access-Control-Allow-Origin"], "*")
+
+    def test_cors_preflight(self):
+        """It should answer CORS preflight requests like the Flask app"""
+        headers = {"Origin": "http://example.com", "Access-Control-Request-Method": "PUT",
+                   "Access-Control-Request-Headers": "Content-Type"}
+        flask_resp = flask_app.test_client().options(BASE_URL, headers=headers)
+        resp = self.client.options(BASE_URL, headers=headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        for header in ("Access-Control-Allow-Origin", "Access-Control-Allow-Headers", "Access-Control-Allow-Methods"):
+            self.assertEqual(resp.headers.get(header), flask_resp.headers.get(header), header)
+
+    def test_startup_leaves_schema_alone(self):
+        """It should not create the schema when the app starts"""
+        path = os.path.join(self.workdir.name, "empty.db")
+        with TestClient(create_asgi_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})) as client:
+            self.assertEqual(client.get("/health").status_code, status.HTTP_200_OK)
+        connection = sqlite3.connect(path)
+        self.assertEqual(connection.execute("SELECT count(*) FROM sqlite_master").fetchone()[0], 0)
+        connection.close()
+
+    def test_async_database_uri(self):
+        """It should map sync URIs to their async drivers"""
+        self.assertEqual(async_database_uri("postgresql://u:p@db/x"), "postgresql+asyncpg://u:p@db/x")
+        self.assertEqual(async_database_uri("sqlite:////tmp/a.db"), "sqlite+aiosqlite:////tmp/a.db")
+        self.assertTrue(async_database_uri("sqlite:///accounts.db").endswith("/instance/accounts.db"))
+
+
+class TestAsgiParity(unittest.TestCase):
+    """Test Cases sending the same requests to the Flask and ASGI apps"""
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        flask_uri = f"sqlite:///{os.path.join(self.workdir.name, 'flask.db')}"
+        asgi_uri = f"sqlite:///{os.path.join(self.workdir.name, 'asgi.db')}"
+        self.flask_app, _ = build_app({"SQLALCHEMY_DATABASE_URI": flask_uri})
+        self.schema_app, _ = build_app({"SQLALCHEMY_DATABASE_URI": asgi_uri})
+        init_db(self.flask_app)
+        init_db(self.schema_app)
+        self.client = TestClient(create_asgi_app({"SQLALCHEMY_DATABASE_URI": asgi_uri}))
+        self.client.__enter__()
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.client.__exit__(None, None, None)
+        for app in (self.flask_app, self.schema_app):
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        self.workdir.cleanup()
+
+    @staticmethod
+    def _documents(content_type, body):
+        """Decode a JSON or NDJSON body, leaving out the creation times that differ between the databases"""
+        if content_type == "application/x-ndjson":
+            documents = [json.loads(line) for line in body.splitlines()]
+        elif content_type == "application/json":
+            documents = json.loads(body)
+        else:
+            return None
+        for document in documents if isinstance(documents, list) else [documents]:
+            document.pop("date_joined", None)
+        return documents
+
+    def test_same_responses(self):
+        """It should answer the same status, ETag, Link and JSON body as the Flask app"""
+        flask_client = self.flask_app.test_client()
+        for method, url, kwargs in PARITY_REQUESTS:
+            flask_resp = flask_client.open(url, method=method, **kwargs)
+            resp = self.client.request(method, url, **kwargs)
+            request = f"{method} {url}"
+            self.assertEqual(resp.status_code, flask_resp.status_code, request)
+            for header in ("ETag", "Link"):
+                self.assertEqual(resp.headers.get(header), flask_resp.headers.get(header), f"{request} {header}")
+            self.assertEqual(self._documents(resp.headers.get("content-type"), resp.content),
+                             self._documents(flask_resp.mimetype, flask_resp.get_data()), request)
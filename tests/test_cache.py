@@ -0,0 +1,247 @@
+"""
+Test cases for the Account cache
+"""
+import os
+import unittest
+from unittest import mock
+from sqlalchemy import delete, event, update
+from sqlalchemy.orm import Session
+from service import status
+from service import app
+from service.cache import LRUCache, NullCache
+from service.models import Account, db
+from service.routes import create_app
+
+BASE_URL = "/accounts"
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test Cases for LRUCache"""
+
+    def test_hit_and_miss_counters(self):
+        """It should count hits and misses"""
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get(1))
+        cache.set(1, "one")
+        self.assertEqual(cache.get(1), "one")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 2})
+
+    def test_evicts_least_recently_used(self):
+        """It should evict the least recently used entry when full"""
+        cache = LRUCache(maxsize=2)
+        cache.set(1, "one")
+        cache.set(2, "two")
+        cache.get(1)
+        cache.set(3, "three")
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), "one")
+        self.assertEqual(cache.get(3), "three")
+
+    def test_entries_expire(self):
+        """It should expire entries after the TTL"""
+        clock = FakeClock()
+        cache = LRUCache(maxsize=2, ttl=10, clock=clock)
+        cache.set(1, "one")
+        clock.now = 9
+        self.assertEqual(cache.get(1), "one")
+        clock.now = 11
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_invalidate_and_clear(self):
+        """It should drop single entries or everything"""
+        cache = LRUCache()
+        cache.set(1, "one")
+        cache.set(2, "two")
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1))
+        cache.clear()
+        self.assertIsNone(cache.get(2))
+
+    def test_set_after_invalidate_is_dropped(self):
+        """It should not store a value read before its key was invalidated or the cache cleared"""
+        cache = LRUCache(maxsize=2)
+        generation = cache.generation(1)
+        cache.invalidate(1)
+        cache.set(1, "stale", generation)
+        self.assertIsNone(cache.get(1))
+        cache.set(1, "fresh", cache.generation(1))
+        self.assertEqual(cache.get(1), "fresh")
+        generation = cache.generation(2)
+        cache.clear()
+        cache.set(2, "stale", generation)
+        self.assertIsNone(cache.get(2))
+
+    def test_forgotten_invalidations_stay_safe(self):
+        """It should drop a stale value even after its invalidation is no longer remembered"""
+        cache = LRUCache(maxsize=2)
+        generation = cache.generation(1)
+        for key in (1, 2, 3):
+            cache.invalidate(key)
+        cache.set(1, "stale", generation)
+        self.assertIsNone(cache.get(1))
+        cache.set(4, "fresh", generation)
+        self.assertIsNone(cache.get(4))
+        cache.set(4, "fresh", cache.generation(4))
+        self.assertEqual(cache.get(4), "fresh")
+
+    def test_null_cache(self):
+        """It should never store anything when disabled"""
+        cache = NullCache()
+        cache.set(1, "one")
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class TestAccountCache(unittest.TestCase):
+    """Test Cases for caching Account.find"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.app = app
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        self.cache = LRUCache()
+        self.original_cache = Account.cache
+        Account.cache = self.cache
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            account = Account(name="Cached", email="cached@example.com", address="1 Cache Lane")
+            account.save()
+            self.account_id = account.id
+
+    def tearDown(self):
+        """This runs after each test"""
+        Account.cache = self.original_cache
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_repeated_reads_hit_the_cache(self):
+        """It should serve repeated reads from the cache"""
+        first = self.client.get(f"{BASE_URL}/{self.account_id}").get_json()
+        second = self.client.get(f"{BASE_URL}/{self.account_id}").get_json()
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_update_invalidates(self):
+        """It should never return a stale Account after PUT"""
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        resp = self.client.put(f"{BASE_URL}/{self.account_id}", json={"name": "Fresh", "email": "fresh@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = self.client.get(f"{BASE_URL}/{self.account_id}").get_json()
+        self.assertEqual(data["name"], "Fresh")
+        self.assertIsNone(data["address"])
+
+    def test_delete_invalidates(self):
+        """It should never return a deleted Account"""
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.client.delete(f"{BASE_URL}/{self.account_id}")
+        resp = self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_write_after_delete_elsewhere(self):
+        """It should answer 404, not 412, for an Account deleted behind the cache's back"""
+        etag = self.client.get(f"{BASE_URL}/{self.account_id}").headers["ETag"]
+        with app.app_context():
+            # Another worker deletes the row, so this worker's cache is not invalidated
+            with db.engine.begin() as connection:
+                connection.execute(Account.__table__.delete().where(Account.__table__.c.id == self.account_id))
+        self.assertEqual(self.client.get(f"{BASE_URL}/{self.account_id}").status_code, status.HTTP_200_OK)
+        stale_etag = '"%d-0"' % self.account_id
+        resp = self.client.patch(f"{BASE_URL}/{self.account_id}", json={"name": "Gone"}, headers={"If-Match": stale_etag})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.delete(f"{BASE_URL}/{self.account_id}", headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_keeps_other_accounts_cached(self):
+        """It should only invalidate the Account a single-row write touched"""
+        other_id = self.client.post(BASE_URL, json={"name": "Other", "email": "other@example.com"}).get_json()["id"]
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.client.get(f"{BASE_URL}/{other_id}")
+        self.client.patch(f"{BASE_URL}/{other_id}", json={"name": "Patched"})
+        self.assertEqual(self.cache.stats()["size"], 1)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{other_id}").get_json()["name"], "Patched")
+
+    def test_bulk_update_invalidates(self):
+        """It should invalidate accounts changed by bulk statements"""
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        operations = [{"op": "update", "id": self.account_id, "data": {"name": "Bulk", "email": "bulk@example.com"}}]
+        self.client.post(f"{BASE_URL}/_bulk", json=operations)
+        data = self.client.get(f"{BASE_URL}/{self.account_id}").get_json()
+        self.assertEqual(data["name"], "Bulk")
+
+    def test_core_statements_invalidate(self):
+        """It should invalidate accounts changed by Core UPDATE and DELETE statements filtered on ORM attributes"""
+        table = Account.__table__
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        with self.app.app_context():
+            db.session.execute(update(table).where(Account.id == self.account_id).values(name="Core"))
+            db.session.commit()
+        self.assertEqual(self.client.get(f"{BASE_URL}/{self.account_id}").get_json()["name"], "Core")
+        with self.app.app_context():
+            db.session.execute(delete(table).where(Account.id == self.account_id))
+            db.session.commit()
+        resp = self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_racing_a_write_is_not_cached(self):
+        """It should not cache a row read before a concurrent write committed"""
+        with self.app.app_context():
+            engine = db.engine
+            writes = []
+
+            def write(conn, cursor, statement, parameters, context, executemany):
+                # Another thread commits a change after the read but before it reaches the cache
+                if not writes:
+                    writes.append(statement)
+                    with Session(engine) as writer:
+                        writer.execute(update(Account).where(Account.id == self.account_id).values(name="Written"))
+                        writer.commit()
+
+            event.listen(engine, "after_cursor_execute", write)
+            try:
+                self.assertEqual(Account.find(self.account_id).name, "Cached")
+            finally:
+                event.remove(engine, "after_cursor_execute", write)
+            db.session.remove()
+        self.assertEqual(self.cache.stats()["size"], 0)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{self.account_id}").get_json()["name"], "Written")
+
+    def test_disabled_by_default(self):
+        """It should only cache accounts when ACCOUNT_CACHE_SIZE is set"""
+        environ = {name: value for name, value in os.environ.items() if not name.startswith("ACCOUNT_CACHE_")}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        self.assertIsInstance(Account.cache, NullCache)
+        with mock.patch.dict(os.environ, {"ACCOUNT_CACHE_SIZE": "10", "ACCOUNT_CACHE_TTL": "5"}):
+            create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        self.assertIsInstance(Account.cache, LRUCache)
+        self.assertEqual((Account.cache.maxsize, Account.cache.ttl), (10, 5))
+
+    def test_rolled_back_changes_are_not_cached(self):
+        """It should not cache uncommitted changes"""
+        with self.app.app_context():
+            account = Account.find(self.account_id)
+            account.name = "Uncommitted"
+            db.session.flush()
+            Account.find(self.account_id)
+            db.session.rollback()
+        data = self.client.get(f"{BASE_URL}/{self.account_id}").get_json()
+        self.assertEqual(data["name"], "Cached")
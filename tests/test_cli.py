@@ -0,0 +1,95 @@
+"""
+Test cases for the Account Service CLI
+"""
+import json
+import os
+import tempfile
+import unittest
+from service import app
+from service.models import Account, db
+
+
+class TestImportCommand(unittest.TestCase):
+    """Test Cases for flask accounts import"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.app = app
+        cls.runner = app.test_cli_runner()
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.workdir.cleanup()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _write(self, name, content):
+        """Write an input file and return its path"""
+        path = os.path.join(self.workdir.name, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        return path
+
+    def _emails(self):
+        """Return the stored emails ordered by id"""
+        with self.app.app_context():
+            return [account.email for account in Account.query.order_by(Account.id)]
+
+    def test_import_ndjson(self):
+        """It should import valid NDJSON rows in chunks and reject the rest"""
+        lines = [json.dumps({"name": f"User {i}", "email": f"user{i}@example.com"}) for i in range(7)]
+        lines += ["not json", json.dumps({"name": "No email"}), lines[0]]
+        path = self._write("accounts.ndjson", "\n".join(lines) + "\n")
+        result = self.runner.invoke(args=["accounts", "import", path, "--chunk-size", "3"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Imported 7 rows", result.output)
+        self.assertIn("rejected 2", result.output)
+        self.assertIn("skipped 1 duplicates", result.output)
+        self.assertIn("rows/s", result.output)
+        self.assertEqual(self._emails(), [f"user{i}@example.com" for i in range(7)])
+
+    def test_import_csv(self):
+        """It should import CSV files with optional columns left empty"""
+        path = self._write("accounts.csv", "name,email,address,phone_number\n"
+                                           "Ann,ann@example.com,1 Main St,\n"
+                                           "Bob,bob@example.com,,555-0000\n")
+        result = self.runner.invoke(args=["accounts", "import", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with self.app.app_context():
+            bob = Account.find_by_email("bob@example.com")
+            self.assertIsNone(bob.address)
+            self.assertEqual(bob.phone_number, "555-0000")
+            self.assertIsNotNone(bob.date_joined)
+        self.assertEqual(len(self._emails()), 2)
+
+    def test_import_resumes_from_checkpoint(self):
+        """It should skip the rows recorded in the checkpoint"""
+        lines = [json.dumps({"name": f"User {i}", "email": f"user{i}@example.com"}) for i in range(5)]
+        path = self._write("accounts.ndjson", "\n".join(lines))
+        checkpoint = os.path.join(self.workdir.name, "import.checkpoint")
+        with open(checkpoint, "w", encoding="utf-8") as handle:
+            json.dump({"source": os.path.abspath(path), "rows": 3}, handle)
+
+        result = self.runner.invoke(args=["accounts", "import", path, "--checkpoint", checkpoint])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Resuming", result.output)
+        self.assertEqual(self._emails(), ["user3@example.com", "user4@example.com"])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_import_rejects_foreign_checkpoint(self):
+        """It should refuse a checkpoint written for another file"""
+        path = self._write("accounts.ndjson", "")
+        checkpoint = self._write("import.checkpoint", json.dumps({"source": "/elsewhere", "rows": 1}))
+        result = self.runner.invoke(args=["accounts", "import", path, "--checkpoint", checkpoint])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("belongs to /elsewhere", result.output)
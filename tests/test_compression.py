@@ -0,0 +1,147 @@
+"""
+Test cases for negotiated response compression
+"""
+import gzip
+import json
+import unittest
+import zlib
+from unittest import mock
+import brotli
+import zstandard
+from service import status
+from service import app
+from service import compression
+from service.models import Account, db
+from service.routes import create_app
+
+BASE_URL = "/accounts"
+NDJSON = "application/x-ndjson"
+
+DECOMPRESS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+class TestCompression(unittest.TestCase):
+    """Test Cases for Accept-Encoding negotiation and compressed bodies"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        rows = [{"name": f"Packed {i}", "email": f"packed{i}@example.com", "address": f"{i} Compression Road"}
+                for i in range(50)]
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.execute(Account.__table__.insert(), rows)
+            db.session.commit()
+
+    def tearDown(self):
+        """This runs after each test"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_encodings(self):
+        """It should send the same JSON compressed with each encoding, with a weak ETag"""
+        plain = self.client.get(BASE_URL)
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(plain.headers["Vary"], "Accept-Encoding")
+        for encoding, decompress in DECOMPRESS.items():
+            resp = self.client.get(BASE_URL, headers={"Accept-Encoding": encoding})
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp.headers["Content-Encoding"], encoding)
+            self.assertEqual(resp.headers["Vary"], "Accept-Encoding")
+            self.assertEqual(resp.headers["Content-Length"], str(len(resp.get_data())))
+            self.assertLess(len(resp.get_data()), len(plain.get_data()) // 4)
+            self.assertEqual(json.loads(decompress(resp.get_data())), plain.get_json())
+            self.assertEqual(resp.headers["ETag"], "W/" + plain.headers["ETag"])
+
+    def test_negotiation(self):
+        """It should honour quality values and prefer zstd, then brotli, when they tie"""
+        cases = {
+            "gzip, deflate, br, zstd": "zstd",
+            "gzip, br": "br",
+            "gzip;q=1.0, br;q=0.5": "gzip",
+            "zstd;q=0, br;q=0, *": "gzip",
+            "identity": None,
+            "deflate": None,
+        }
+        for accept, expected in cases.items():
+            resp = self.client.get(BASE_URL, headers={"Accept-Encoding": accept})
+            self.assertEqual(resp.headers.get("Content-Encoding"), expected, accept)
+
+    def test_small_responses(self):
+        """It should send responses under COMPRESSION_MIN_SIZE as they are, without Vary"""
+        resp = self.client.get(f"{BASE_URL}/1", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertNotIn("Vary", resp.headers)
+        self.assertEqual(resp.headers["ETag"], '"1-1"')
+
+    def test_conditional_requests(self):
+        """It should accept the weak ETag of a compressed response in If-None-Match and If-Match"""
+        etag = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+        resp = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        resp = self.client.patch(f"{BASE_URL}/1", json={"name": "Patched"}, headers={"If-Match": 'W/"1-1"'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resp = self.client.patch(f"{BASE_URL}/1", json={"name": "Stale"}, headers={"If-Match": 'W/"1-1"'})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_not_modified(self):
+        """It should send a 304 the Vary header and ETag of the response it revalidates"""
+        for encoding in DECOMPRESS:
+            etag = self.client.get(BASE_URL, headers={"Accept-Encoding": encoding}).headers["ETag"]
+            resp = self.client.get(BASE_URL, headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+            self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(resp.headers["ETag"], etag)
+            self.assertEqual(resp.headers["Vary"], "Accept-Encoding")
+            self.assertNotIn("Content-Encoding", resp.headers)
+            self.assertEqual(resp.get_data(), b"")
+        small = self.client.get(f"{BASE_URL}/1", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+        resp = self.client.get(f"{BASE_URL}/1", headers={"Accept-Encoding": "gzip", "If-None-Match": small})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.headers["ETag"], small)
+
+    def test_stream(self):
+        """It should compress a streamed list incrementally, flushing complete chunks as it goes"""
+        expected = self.client.get(BASE_URL, headers={"Accept": NDJSON}).get_data()
+        for encoding, decompress in DECOMPRESS.items():
+            with mock.patch.object(compression, "STREAM_FLUSH_SIZE", 1024):
+                resp = self.client.get(BASE_URL, headers={"Accept": NDJSON, "Accept-Encoding": encoding})
+                chunks = list(resp.response)
+            self.assertEqual(resp.headers["Content-Encoding"], encoding)
+            self.assertNotIn("Content-Length", resp.headers)
+            self.assertGreater(len(chunks), 2)
+            # Every flushed prefix decodes on its own, so a client can read lines before the stream ends
+            self.assertTrue(expected.startswith(self._decode_prefix(encoding, chunks[0])))
+            self.assertEqual(decompress(b"".join(chunks)), expected)
+
+    @staticmethod
+    def _decode_prefix(encoding, data):
+        """Decompress the start of a stream that has not been finished"""
+        if encoding == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data)
+        if encoding == "br":
+            return brotli.Decompressor().process(data)
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    def test_configuration(self):
+        """It should only offer the configured encodings, at their configured level"""
+        gzip_app = create_app({"COMPRESSION_LEVELS": {"gzip": 1}, "COMPRESSION_MIN_SIZE": 0})
+        client = gzip_app.test_client()
+        resp = client.get("/", headers={"Accept-Encoding": "zstd, br, gzip"})
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertEqual(resp.get_data()[8], 4)  # gzip header flag of the fastest level
+        disabled_app = create_app({"COMPRESSION_LEVELS": {}, "COMPRESSION_MIN_SIZE": 0})
+        resp = disabled_app.test_client().get("/", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertNotIn("Vary", resp.headers)
@@ -0,0 +1,150 @@
+"""
+Test cases for Account export jobs
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from service import status
+from service import app
+from service import exports
+from service.models import Account, db
+from service.routes import create_app
+
+EXPORTS_URL = "/accounts/exports"
+
+
+class TestExportJobs(unittest.TestCase):
+    """Test Cases for background exports"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.app = app
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.app.config['EXPORT_DIR'] = self.workdir.name
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.execute(Account.__table__.insert(), [
+                {"name": f"Export {i}", "email": f"export{i}@example.com", "address": f"{i} Export Way"}
+                for i in range(30)
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.app.config['EXPORT_DIR'] = None
+        self.workdir.cleanup()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _wait_for(self, location):
+        """Poll an export until it is no longer in progress"""
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            resp = self.client.get(location)
+            if resp.status_code != status.HTTP_202_ACCEPTED:
+                return resp
+            self.assertIn(resp.get_json()["status"], ("pending", "running"))
+            time.sleep(0.02)
+        self.fail("export did not finish")
+
+    def test_export_ndjson(self):
+        """It should export every Account to a gzip-compressed NDJSON file"""
+        resp = self.client.post(EXPORTS_URL, json={"format": "ndjson"})
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.get_json()["status"], "pending")
+
+        resp = self._wait_for(resp.headers["Location"])
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.mimetype, "application/gzip")
+        lines = gzip.decompress(resp.get_data()).decode().splitlines()
+        resp.close()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 30)
+        self.assertEqual(records[0]["email"], "export0@example.com")
+
+    def test_export_csv(self):
+        """It should export every Account to a gzip-compressed CSV file"""
+        resp = self.client.post(EXPORTS_URL, json={"format": "csv"})
+        resp = self._wait_for(resp.headers["Location"])
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(resp.get_data()).decode())))
+        resp.close()
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[29]["address"], "29 Export Way")
+
+    def test_export_bad_format(self):
+        """It should reject an unknown export format and a body that is not an object"""
+        for body in ({"format": "xml"}, [1], "csv"):
+            resp = self.client.post(EXPORTS_URL, json=body)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, body)
+
+    def test_export_not_found(self):
+        """It should not find an unknown or malformed export id"""
+        resp = self.client.get(f"{EXPORTS_URL}/{'0' * 32}")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.get(f"{EXPORTS_URL}/..%2F..%2Fetc")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def _write_job(self, job_id, owner, status_name="running", age=0):
+        """Write the state file of an unfinished job, last touched age seconds ago"""
+        path = os.path.join(self.workdir.name, f"{job_id}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"id": job_id, "format": "ndjson", "status": status_name, "rows": 0, "total": 30,
+                       "owner": owner}, handle)
+        touched = time.time() - age
+        os.utime(path, (touched, touched))
+        return f"{EXPORTS_URL}/{job_id}"
+
+    def test_export_owner_exited(self):
+        """It should fail a job whose owning process on this host has exited"""
+        finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], check=True,
+                                  capture_output=True, text=True)
+        location = self._write_job("a" * 32, {"host": socket.gethostname(), "pid": int(finished.stdout)})
+        resp = self.client.get(location)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_json()["status"], "failed")
+        self.assertEqual(self.client.get(location).get_json()["status"], "failed")
+
+    def test_export_heartbeat(self):
+        """It should fail a job whose state file missed three heartbeats, and keep a live one in progress"""
+        owner = {"host": "another-pod", "pid": 1}
+        heartbeat = self.app.config['EXPORT_HEARTBEAT_SECONDS']
+        live = self._write_job("b" * 32, owner, "pending", age=heartbeat)
+        stale = self._write_job("c" * 32, owner, age=4 * heartbeat)
+        self.assertEqual(self.client.get(live).status_code, status.HTTP_202_ACCEPTED)
+        resp = self.client.get(stale)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_json()["status"], "failed")
+
+    def test_export_state_removed(self):
+        """It should skip a queued job whose state file is gone or already failed"""
+        exports._run_export(self.app, "d" * 32)
+        self._write_job("e" * 32, {"host": "another-pod", "pid": 1}, "failed")
+        exports._run_export(self.app, "e" * 32)
+        self.assertFalse(os.path.exists(os.path.join(self.workdir.name, f"{'e' * 32}.ndjson.gz")))
+
+    def test_export_dir_from_environment(self):
+        """It should read the export directory from EXPORT_DIR so that replicas can share a volume"""
+        with mock.patch.dict(os.environ, {"EXPORT_DIR": self.workdir.name}):
+            other = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        self.assertEqual(other.config['EXPORT_DIR'], self.workdir.name)
+        with mock.patch.dict(os.environ, {"EXPORT_DIR": ""}):
+            other = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        self.assertIsNone(other.config['EXPORT_DIR'])
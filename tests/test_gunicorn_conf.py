@@ -0,0 +1,100 @@
+"""
+Test cases for the gunicorn configuration
+"""
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def load_config(environ=None):
+    """Execute gunicorn.conf.py with the given environment and return it as a module"""
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", CONFIG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, environ or {}, clear=True):
+        spec.loader.exec_module(module)
+    return module
+
+
+class TestGunicornConfig(unittest.TestCase):
+    """Test Cases for sizing and overriding the gunicorn settings"""
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.config = load_config()
+
+    def tearDown(self):
+        """This runs after each test"""
+        self.workdir.cleanup()
+
+    def _write(self, relative_path, content):
+        """Write a fake cgroup file"""
+        path = os.path.join(self.workdir.name, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(content)
+
+    def test_cgroup_v2_quota(self):
+        """It should read a fractional CPU quota from cgroup v2"""
+        self._write("cpu.max", "50000 100000\n")
+        self.assertEqual(self.config._cgroup_v2_quota(self.workdir.name), 0.5)
+        self._write("cpu.max", "max 100000\n")
+        self.assertIsNone(self.config._cgroup_v2_quota(self.workdir.name))
+
+    def test_cgroup_v1_quota(self):
+        """It should read the CPU quota from cgroup v1 and treat -1 as unlimited"""
+        self._write("cpu/cpu.cfs_quota_us", "200000\n")
+        self._write("cpu/cpu.cfs_period_us", "100000\n")
+        self.assertEqual(self.config._cgroup_v1_quota(self.workdir.name), 2)
+        self._write("cpu/cpu.cfs_quota_us", "-1\n")
+        self.assertIsNone(self.config._cgroup_v1_quota(self.workdir.name))
+
+    def test_cpu_limit(self):
+        """It should use the quota when it is below the available CPUs, and the CPUs otherwise"""
+        self._write("cpu.max", "50000 100000\n")
+        self.assertEqual(self.config.cpu_limit(self.workdir.name), 0.5)
+        os.remove(os.path.join(self.workdir.name, "cpu.max"))
+        self.assertGreaterEqual(self.config.cpu_limit(self.workdir.name), 1)
+
+    def test_default_workers(self):
+        """It should run two workers per CPU plus one, and two below one CPU"""
+        self.assertEqual(self.config.default_workers(0.5), 2)
+        self.assertEqual(self.config.default_workers(1), 3)
+        self.assertEqual(self.config.default_workers(1.5), 5)
+        self.assertEqual(self.config.default_workers(4), 9)
+
+    def test_defaults(self):
+        """It should default to preloaded gthread workers with request recycling"""
+        self.assertEqual(self.config.worker_class, "gthread")
+        self.assertEqual(self.config.bind, "0.0.0.0:8080")
+        self.assertTrue(self.config.preload_app)
+        self.assertEqual(self.config.max_requests, 5000)
+        self.assertEqual(self.config.max_requests_jitter, 500)
+
+    def test_environment_overrides(self):
+        """It should let the environment override every setting"""
+        config = load_config({
+            "PORT": "9090", "WEB_CONCURRENCY": "7", "GUNICORN_THREADS": "2", "GUNICORN_WORKER_CLASS": "sync",
+            "GUNICORN_KEEPALIVE": "30", "GUNICORN_MAX_REQUESTS": "0", "GUNICORN_PRELOAD": "false",
+        })
+        self.assertEqual(config.bind, "0.0.0.0:9090")
+        self.assertEqual(config.workers, 7)
+        self.assertEqual(config.threads, 2)
+        self.assertEqual(config.worker_class, "sync")
+        self.assertEqual(config.keepalive, 30)
+        self.assertEqual(config.max_requests, 0)
+        self.assertFalse(config.preload_app)
+
+    def test_metrics_directory(self):
+        """It should share metrics through a directory that is emptied when gunicorn starts"""
+        self.assertTrue(self.config.METRICS_DIR)
+        config = load_config({"PROMETHEUS_MULTIPROC_DIR": self.workdir.name})
+        self.assertEqual(config.METRICS_DIR, self.workdir.name)
+        self._write("counter_123.db", "stale")
+        self._write("notes.txt", "kept")
+        config.on_starting(None)
+        self.assertEqual(os.listdir(self.workdir.name), ["notes.txt"])
@@ -0,0 +1,101 @@
+"""
+Test cases for the structured logging pipeline
+"""
+import io
+import json
+import logging
+import queue
+import unittest
+from service import app
+from service.logs import NonBlockingQueueHandler, configure_logging, flush_logs
+from service.models import db
+
+BASE_URL = "/accounts"
+
+
+class TestLogging(unittest.TestCase):
+    """Test Cases for JSON log records written off the request thread"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        self.config = {key: app.config[key] for key in ("LOG_LEVEL", "LOG_SAMPLE_RATES")}
+        self.stream = io.StringIO()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        """This runs after each test"""
+        app.config.update(self.config)
+        configure_logging(app)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _records(self):
+        """Return the JSON records written so far"""
+        flush_logs()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_request_records_are_json(self):
+        """It should write one JSON object per record, tagged with the request"""
+        configure_logging(app, self.stream)
+        self.client.get(f"{BASE_URL}/0")
+        records = self._records()
+        self.assertEqual(records[0]["message"], "Request to retrieve Account with id: 0")
+        self.assertEqual(records[0]["level"], "INFO")
+        self.assertEqual(records[0]["logger"], "service.routes")
+        self.assertEqual((records[0]["method"], records[0]["path"], records[0]["endpoint"]),
+                         ("GET", f"{BASE_URL}/0", "get_accounts"))
+
+    def test_exception_traceback(self):
+        """It should render the traceback of a logged exception"""
+        configure_logging(app, self.stream)
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            app.logger.exception("Something failed")
+        record = self._records()[0]
+        self.assertEqual(record["message"], "Something failed")
+        self.assertIn("ValueError: broken", record["exception"])
+        self.assertNotIn("method", record)
+
+    def test_level(self):
+        """It should drop records below LOG_LEVEL"""
+        app.config['LOG_LEVEL'] = "WARNING"
+        configure_logging(app, self.stream)
+        self.client.get(f"{BASE_URL}/0")
+        app.logger.warning("Kept")
+        self.assertEqual([record["message"] for record in self._records()], ["Kept"])
+
+    def test_sampling(self):
+        """It should sample INFO records of a hot endpoint per request, and keep its warnings"""
+        app.config['LOG_SAMPLE_RATES'] = {"get_accounts": 0.0}
+        configure_logging(app, self.stream)
+        self.client.get(f"{BASE_URL}/0")
+        self.client.get(f"{BASE_URL}?limit=1")
+        with app.test_request_context(f"{BASE_URL}/0"):
+            app.preprocess_request()
+            app.logger.warning("Slow read")
+        endpoints = {(record["endpoint"], record["level"]) for record in self._records()}
+        self.assertEqual(endpoints, {("list_accounts", "INFO"), ("get_accounts", "WARNING")})
+
+    def test_full_queue_drops(self):
+        """It should drop and count records instead of blocking when the queue is full"""
+        handler = NonBlockingQueueHandler(queue.Queue(1))
+        logger = logging.getLogger("tests.full_queue")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            logger.warning("first")
+            logger.warning("second")
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "first")
+        self.assertEqual(handler.dropped, 1)
@@ -0,0 +1,90 @@
+"""
+Test cases for the Prometheus metrics
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from prometheus_client import REGISTRY
+from service import status
+from service import app
+from service.models import Account, db
+
+BASE_URL = "/accounts"
+LATENCY_COUNT = "http_request_duration_seconds_count"
+
+
+def sample(name, **labels):
+    """Return the current value of a metric sample, 0 when it has not been recorded yet"""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics(unittest.TestCase):
+    """Test Cases for request instrumentation and /metrics"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            account = Account(name="Measured", email="measured@example.com", address="1 Metric Way")
+            account.save()
+            self.account_id = account.id
+
+    def tearDown(self):
+        """This runs after each test"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_latency_by_route_and_status(self):
+        """It should record latency under the route template and status code"""
+        route = "/accounts/<int:account_id>"
+        found = sample(LATENCY_COUNT, method="GET", route=route, status="200")
+        missing = sample(LATENCY_COUNT, method="GET", route=route, status="404")
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        self.client.get(f"{BASE_URL}/0")
+        self.assertEqual(sample(LATENCY_COUNT, method="GET", route=route, status="200"), found + 2)
+        self.assertEqual(sample(LATENCY_COUNT, method="GET", route=route, status="404"), missing + 1)
+
+    def test_unmatched_routes_share_a_label(self):
+        """It should not create a label per unknown URL"""
+        before = sample(LATENCY_COUNT, method="GET", route="<unmatched>", status="404")
+        self.client.get("/no-such-page")
+        self.client.get("/another-missing-page")
+        self.assertEqual(sample(LATENCY_COUNT, method="GET", route="<unmatched>", status="404"), before + 2)
+
+    def test_metrics_endpoint(self):
+        """It should expose request, in-flight, pool and cache metrics in the Prometheus format"""
+        self.client.get(f"{BASE_URL}/{self.account_id}")
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.content_type.startswith("text/plain; version=0.0.4"))
+        body = resp.get_data(as_text=True)
+        for name in ("http_request_duration_seconds_bucket", "http_requests_in_flight", "account_cache_hits",
+                     "account_cache_misses", "db_pool_checked_out"):
+            self.assertIn(name, body)
+        # Only the scrape itself is in flight
+        self.assertEqual(sample("http_requests_in_flight"), 0)
+        self.assertIn("http_requests_in_flight 1.0", body)
+
+    def test_multiple_processes(self):
+        """It should add up requests served by separate worker processes"""
+        with tempfile.TemporaryDirectory() as metrics_dir, tempfile.TemporaryDirectory() as workdir:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+                   "DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'metrics.db')}"}
+            worker = "import service; service.app.test_client().get('/')"
+            scrape = "import service; print(service.app.test_client().get('/metrics').get_data(as_text=True))"
+            for script in (worker, worker):
+                subprocess.run([sys.executable, "-c", script], env=env, check=True)
+            output = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, capture_output=True,
+                                    text=True).stdout
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/",status="200"} 2.0', output)
@@ -0,0 +1,137 @@
+"""
+Test cases for the liveness and readiness probes
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import event
+from service import status
+from service import app
+from service.models import db
+from service.probes import ReadinessCheck
+from service.routes import create_app
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHealth(unittest.TestCase):
+    """Test Cases for the /health fast path"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def test_health_skips_flask(self):
+        """It should answer /health without dispatching into Flask"""
+        with mock.patch.object(app, "full_dispatch_request") as dispatch:
+            resp = self.client.get("/health")
+        dispatch.assert_not_called()
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_json(), {"status": "healthy"})
+        self.assertEqual(resp.headers["X-Frame-Options"], "SAMEORIGIN")
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], "*")
+        self.assertNotIn("Strict-Transport-Security", resp.headers)
+
+    def test_health_body_matches_flask(self):
+        """It should send the same bytes as the Flask /health route"""
+        with app.test_request_context("/health"):
+            flask_body = app.make_response(app.view_functions["health_check"]()).get_data()
+        self.assertEqual(self.client.get("/health").get_data(), flask_body)
+
+    def test_health_headers(self):
+        """It should send the same CORS and HTTPS headers as the Flask routes"""
+        resp = self.client.get("/health", headers={"Origin": "https://example.com"},
+                               environ_overrides={"wsgi.url_scheme": "https"})
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], "https://example.com")
+        self.assertEqual(resp.headers["Vary"], "Origin")
+        self.assertIn("max-age", resp.headers["Strict-Transport-Security"])
+        head = self.client.head("/health")
+        self.assertEqual(head.status_code, status.HTTP_200_OK)
+        self.assertEqual(head.get_data(), b"")
+
+    def test_other_methods_reach_flask(self):
+        """It should leave anything but GET and HEAD probes to Flask"""
+        self.assertEqual(self.client.post("/health").status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class TestReadiness(unittest.TestCase):
+    """Test Cases for the cached /ready check"""
+
+    def setUp(self):
+        """This runs before each test"""
+        self.workdir = tempfile.TemporaryDirectory()
+        self.apps = []
+
+    def tearDown(self):
+        """This runs after each test"""
+        for test_app in self.apps:
+            with test_app.app_context():
+                db.engine.dispose()
+        self.workdir.cleanup()
+
+    def _app(self, path="ready.db", **config):
+        """Create an app on its own SQLite database"""
+        test_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.workdir.name, path)}",
+                               **config})
+        self.apps.append(test_app)
+        return test_app
+
+    def test_ready(self):
+        """It should report the database and pool when ready"""
+        resp = self._app().test_client().get("/ready")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual((data["status"], data["database"]), ("ready", "ok"))
+        self.assertEqual(data["pool"]["class"], "QueuePool")
+        self.assertFalse(data["pool"]["saturated"])
+        self.assertEqual(resp.headers["Cache-Control"], "no-store")
+
+    def test_result_is_cached(self):
+        """It should query the database at most once per interval"""
+        test_app = self._app()
+        clock = FakeClock()
+        check = ReadinessCheck(test_app, interval=2, clock=clock)
+        probes = []
+        with test_app.app_context():
+            event.listen(db.engine, "before_cursor_execute", lambda *args: probes.append(args[2]))
+        for _ in range(5):
+            self.assertEqual(check()[0], status.HTTP_200_OK)
+        self.assertEqual(probes, ["SELECT 1"])
+        clock.now = 2.5
+        check()
+        self.assertEqual(probes, ["SELECT 1", "SELECT 1"])
+
+    def test_database_unreachable(self):
+        """It should answer 503 when the database cannot be reached"""
+        test_app = self._app(path=os.path.join("missing", "ready.db"))
+        with self.assertLogs(test_app.logger, "WARNING") as logs:
+            resp = test_app.test_client().get("/ready")
+        self.assertEqual(resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(resp.get_data(), b'{"status":"unavailable"}\n')
+        self.assertIn("OperationalError", "\n".join(logs.output))
+
+    def test_pool_saturated(self):
+        """It should answer 503 without waiting for a connection when the pool is exhausted"""
+        test_app = self._app(SQLALCHEMY_ENGINE_OPTIONS={"pool_size": 1, "max_overflow": 0, "pool_timeout": 30})
+        with test_app.app_context():
+            held = db.engine.connect()
+        try:
+            with self.assertLogs(test_app.logger, "WARNING") as logs:
+                resp = test_app.test_client().get("/ready")
+        finally:
+            held.close()
+        self.assertEqual(resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(resp.get_json(), {"status": "unavailable"})
+        self.assertIn("pool exhausted", "\n".join(logs.output))
+        self.assertIn("'checked_out': 1", "\n".join(logs.output))
@@ -0,0 +1,171 @@
+"""
+Test cases for query tracking and per-endpoint query budgets
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from service import status
+from service import app
+from service.cache import LRUCache
+from service.models import Account, db
+from service.queries import assert_max_queries, explain, track_queries
+from service.routes import create_app
+
+BASE_URL = "/accounts"
+
+
+class TestQueryBudgets(unittest.TestCase):
+    """Test Cases holding each endpoint to a fixed number of statements"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def setUp(self):
+        """This runs before each test"""
+        self.original_cache = Account.cache
+        Account.cache = LRUCache()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for i in range(5):
+                Account(name=f"Budget {i}", email=f"budget{i}@example.com", address=f"{i} Oak Street").save()
+
+    def tearDown(self):
+        """This runs after each test"""
+        app.config['QUERY_COUNT_HEADER'] = False
+        Account.cache = self.original_cache
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_read_budgets(self):
+        """It should read a page, a search or an Account with one statement"""
+        for url in (BASE_URL, f"{BASE_URL}?limit=2&after_id=2", f"{BASE_URL}?email=budget1@example.com",
+                    f"{BASE_URL}/search?q=oak", f"{BASE_URL}/1"):
+            with assert_max_queries(1):
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK, url)
+        with assert_max_queries(1):
+            lines = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"}).get_data()
+        self.assertEqual(len(lines.splitlines()), 5)
+        with assert_max_queries(0):
+            self.client.get(f"{BASE_URL}/1")
+
+    def test_batch_get_budget(self):
+        """It should read a list of Accounts with one IN query, and none once they are cached"""
+        with assert_max_queries(1):
+            resp = self.client.get(f"{BASE_URL}?ids=5,3,1,42")
+        self.assertEqual(len(resp.get_json()["accounts"]), 3)
+        with assert_max_queries(0):
+            resp = self.client.post(f"{BASE_URL}/_get", json={"ids": [1, 3, 5]})
+        self.assertEqual(resp.get_json()["missing"], [])
+
+    def test_write_budgets(self):
+        """It should write an Account with one statement, plus one to read back a created row"""
+        with assert_max_queries(2):
+            resp = self.client.post(BASE_URL, json={"name": "New", "email": "new@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        requests = (
+            lambda: self.client.put(f"{BASE_URL}/1", json={"name": "Put", "email": "put@example.com"}),
+            lambda: self.client.patch(f"{BASE_URL}/1", json={"name": "Patch"}),
+            lambda: self.client.put(f"{BASE_URL}/by-email/upsert@example.com", json={"name": "Upsert"}),
+            lambda: self.client.delete(f"{BASE_URL}/1"),
+        )
+        for request in requests:
+            with assert_max_queries(1):
+                resp = request()
+            self.assertLess(resp.status_code, 300)
+
+    def test_bulk_budget_does_not_grow_with_the_batch(self):
+        """It should apply a bulk create with the same statements for 5 items as for 500"""
+        for size in (5, 500):
+            operations = [{"op": "create", "data": {"name": f"Bulk {i}", "email": f"bulk{size}-{i}@example.com"}}
+                          for i in range(size)]
+            with assert_max_queries(3):
+                resp = self.client.post(f"{BASE_URL}/_bulk", json=operations)
+            self.assertEqual({item["status"] for item in resp.get_json()}, {status.HTTP_201_CREATED})
+            self.assertEqual(len({item["id"] for item in resp.get_json()}), size)
+
+    def test_budget_exceeded(self):
+        """It should fail and list the statements when a block exceeds its budget"""
+        with self.assertRaises(AssertionError) as context:
+            with assert_max_queries(0):
+                self.client.get(BASE_URL)
+        self.assertIn("1 queries executed, budget is 0", str(context.exception))
+        self.assertIn("SELECT", str(context.exception))
+
+    def test_query_count_header(self):
+        """It should report the request's statements in X-Query-Count when enabled"""
+        self.assertNotIn("X-Query-Count", self.client.get(BASE_URL).headers)
+        app.config['QUERY_COUNT_HEADER'] = True
+        with track_queries() as tracker:
+            resp = self.client.get(BASE_URL)
+        self.assertEqual(resp.headers["X-Query-Count"], "1")
+        self.assertEqual(tracker.count, 1)
+        self.assertTrue(resp.headers["Server-Timing"].startswith("db;dur="))
+        self.assertEqual(self.client.get("/").headers["X-Query-Count"], "0")
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    """Test Cases for logging slow statements with their plan"""
+
+    def test_slow_query_logged_with_plan(self):
+        """It should log statements over the threshold with their query plan"""
+        with tempfile.TemporaryDirectory() as workdir:
+            slow_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'slow.db')}",
+                                   "SLOW_QUERY_MS": 0})
+            with slow_app.app_context():
+                db.create_all()
+                with self.assertLogs("service.queries", "WARNING") as logs:
+                    resp = slow_app.test_client().get(f"{BASE_URL}?email=nobody@example.com")
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                db.session.remove()
+                db.engine.dispose()
+        output = "\n".join(logs.output)
+        self.assertIn("Slow query", output)
+        self.assertIn("3 parameters", output)
+        self.assertIn("ix_accounts_email_lower", output)
+        self.assertNotIn("nobody@example.com", output)
+
+    def test_slow_executemany_logged_without_values(self):
+        """It should log the row count of a slow executemany, not its rows"""
+        with tempfile.TemporaryDirectory() as workdir:
+            slow_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'slow.db')}",
+                                   "SLOW_QUERY_MS": 0})
+            with slow_app.app_context():
+                db.create_all()
+                rows = [{"name": f"Private {i}", "email": f"private{i}@example.com"} for i in range(3)]
+                with self.assertLogs("service.queries", "WARNING") as logs:
+                    db.session.execute(Account.__table__.insert(), rows)
+                db.session.remove()
+                db.engine.dispose()
+        output = "\n".join(logs.output)
+        self.assertIn("3 rows", output)
+        self.assertNotIn("private", output)
+
+    def test_explain_failure_rolls_back_to_savepoint(self):
+        """It should take a PostgreSQL plan in a savepoint and roll back to it when EXPLAIN fails"""
+        executed = []
+
+        class Error(Exception):
+            """Stand-in for the driver's base exception"""
+
+        def execute(sql, parameters=None):
+            executed.append(sql)
+            if sql.startswith("EXPLAIN"):
+                raise Error("column \"secret@example.com\" does not exist")
+
+        conn = mock.Mock()
+        conn.dialect.name = "postgresql"
+        conn.dialect.loaded_dbapi.Error = Error
+        conn.connection.cursor.return_value.execute.side_effect = execute
+        plan = explain(conn, "SELECT * FROM accounts WHERE email = %(email)s", {"email": "secret@example.com"})
+        self.assertEqual(plan, "(no plan: Error)")
+        self.assertEqual(executed, ["SAVEPOINT explain_slow_query",
+                                    "EXPLAIN SELECT * FROM accounts WHERE email = %(email)s",
+                                    "ROLLBACK TO SAVEPOINT explain_slow_query"])
+        conn.connection.cursor.return_value.close.assert_called_once()
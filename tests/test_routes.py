@@ -3,9 +3,14 @@ Test cases for Account Service
 """
 import unittest
 import json
+import time
+from datetime import datetime
+from sqlalchemy import event
 from service import status
+from flask.json.provider import DefaultJSONProvider
 from service import app, talisman
 from service.models import Account, db
+from service.queries import track_queries
 
 BASE_URL = "/accounts"
 HTTPS_ENVIRON = {'wsgi.url_scheme': 'https'}
@@ -49,6 +54,16 @@ class TestAccountService(unittest.TestCase):
                 accounts.append(account)
         return accounts
     
+    def _seed_accounts(self, count, start=0):
+        """Helper method to insert many accounts with a single statement"""
+        rows = [
+            {"name": f"Seed {i}", "email": f"seed{i}@example.com", "address": f"{i} Seed Street"}
+            for i in range(start, start + count)
+        ]
+        with self.app.app_context():
+            db.session.execute(Account.__table__.insert(), rows)
+            db.session.commit()
+
     def test_create_account(self):
         """It should Create a new Account"""
         account_data = {
@@ -76,6 +91,143 @@ class TestAccountService(unittest.TestCase):
         data = resp.get_json()
         self.assertEqual(len(data), 5)
     
+    def test_list_accounts_paginated(self):
+        """It should page through Accounts with a keyset cursor"""
+        self._create_accounts(5)
+        resp = self.client.get(f"{BASE_URL}?limit=2")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        first_page = resp.get_json()
+        self.assertEqual(len(first_page), 2)
+        self.assertIn('rel="next"', resp.headers["Link"])
+        self.assertIn(f"after_id={first_page[-1]['id']}", resp.headers["Link"])
+
+        seen = [account["id"] for account in first_page]
+        while "Link" in resp.headers:
+            next_url = resp.headers["Link"].split(";")[0].strip("<>")
+            resp = self.client.get(next_url)
+            seen.extend(account["id"] for account in resp.get_json())
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_list_accounts_page_size_is_bounded(self):
+        """It should cap the page size at MAX_PAGE_SIZE"""
+        self._seed_accounts(30)
+        self.app.config['MAX_PAGE_SIZE'] = 10
+        try:
+            resp = self.client.get(f"{BASE_URL}?limit=1000")
+        finally:
+            self.app.config['MAX_PAGE_SIZE'] = 1000
+        self.assertEqual(len(resp.get_json()), 10)
+
+    def test_list_accounts_bad_page_args(self):
+        """It should reject invalid pagination parameters"""
+        resp = self.client.get(f"{BASE_URL}?limit=abc")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(f"{BASE_URL}?limit=0")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_accounts_page_uses_primary_key(self):
+        """It should seek by primary key instead of scanning the table"""
+        with self.app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+            statements = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                Account.page_values(after_id=10, limit=5)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+            sql, parameters = statements[0]
+            plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        self.assertIn("INTEGER PRIMARY KEY", detail)
+
+    def test_list_accounts_latency_is_flat(self):
+        """It should serve a deep page as fast from a large table as from a small one"""
+        def timed_page(after_id):
+            start = time.perf_counter()
+            for _ in range(20):
+                resp = self.client.get(f"{BASE_URL}?limit=50&after_id={after_id}")
+                self.assertEqual(len(resp.get_json()), 50)
+            return time.perf_counter() - start
+
+        self._seed_accounts(200)
+        small = timed_page(100)
+        self._seed_accounts(19800, start=200)
+        large = timed_page(19000)
+        self.assertLess(large, small * 3)
+
+    def test_stream_accounts_ndjson(self):
+        """It should stream every Account as NDJSON when asked to"""
+        self._seed_accounts(250)
+        self.app.config['STREAM_BATCH_SIZE'] = 40
+        try:
+            resp = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"})
+            body = resp.get_data(as_text=True)
+        finally:
+            self.app.config['STREAM_BATCH_SIZE'] = 1000
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 250)
+        self.assertEqual(records[0]["email"], "seed0@example.com")
+        ids = [record["id"] for record in records]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_stream_accounts_fetches_in_batches(self):
+        """It should stream from one statement that fetches STREAM_BATCH_SIZE rows at a time"""
+        self._seed_accounts(25)
+        batch_sizes = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            batch_sizes.append(context.execution_options.get("yield_per"))
+
+        self.app.config['STREAM_BATCH_SIZE'] = 10
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            with track_queries() as tracker:
+                body = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"}).get_data(as_text=True)
+        finally:
+            self.app.config['STREAM_BATCH_SIZE'] = 1000
+            with self.app.app_context():
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(len(body.splitlines()), 25)
+        self.assertEqual(tracker.count, 1)
+        self.assertEqual(batch_sizes, [10])
+
+    def test_list_accounts_defaults_to_json(self):
+        """It should keep returning a JSON array for regular clients"""
+        self._create_accounts(2)
+        resp = self.client.get(BASE_URL, headers={"Accept": "application/json, application/x-ndjson;q=0.5"})
+        self.assertEqual(resp.mimetype, "application/json")
+        self.assertEqual(len(resp.get_json()), 2)
+
+    def test_fast_read_path_is_byte_identical(self):
+        """It should encode reads exactly like ORM serialization with the default provider"""
+        self._create_accounts(3)
+        self._post_account(name="Zoë Ünïcode", email="zoe@example.com", phone_number=None)
+        default = DefaultJSONProvider(self.app)
+        with self.app.app_context():
+            accounts = Account.query.order_by(Account.id).all()
+            expected_list = default.response([account.serialize() for account in accounts]).get_data()
+            expected_one = default.response(accounts[-1].serialize()).get_data()
+            account_id = accounts[-1].id
+        self.assertEqual(self.client.get(BASE_URL).get_data(), expected_list)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{account_id}").get_data(), expected_one)
+
+    def test_fast_json_provider_falls_back(self):
+        """It should fall back to the standard library for output orjson cannot match"""
+        default = DefaultJSONProvider(self.app)
+        for value in ({"b": 1, "a": [None, True, "x"]}, {"name": "Zoë"}, {1: "int key"}, {"n": 2 ** 70}):
+            self.assertEqual(self.app.json.response(value).get_data(), default.response(value).get_data())
+            self.assertEqual(self.app.json.dumps(value, separators=(",", ":")),
+                             default.dumps(value, separators=(",", ":")))
+
     def test_read_an_account(self):
         """It should Read a single Account"""
         # Create an account first
@@ -160,6 +312,427 @@ class TestAccountService(unittest.TestCase):
         resp = self.client.delete(BASE_URL)
         self.assertEqual(resp.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
     
+    def _post_account(self, **overrides):
+        """Helper method to create one account through the API"""
+        account_data = {"name": "Tagged", "email": "tagged@example.com", "address": "1 Tag St"}
+        account_data.update(overrides)
+        resp = self.client.post(BASE_URL, json=account_data)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        return resp
+
+    def test_read_an_account_not_modified(self):
+        """It should answer 304 when the Account has not changed"""
+        created = self._post_account()
+        account_id = created.get_json()["id"]
+        resp = self.client.get(f"{BASE_URL}/{account_id}")
+        etag = resp.headers["ETag"]
+        self.assertEqual(etag, created.headers["ETag"])
+
+        resp = self.client.get(f"{BASE_URL}/{account_id}", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.get_data(), b"")
+
+        self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Changed", "email": "tagged@example.com"})
+        resp = self.client.get(f"{BASE_URL}/{account_id}", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_list_accounts_not_modified(self):
+        """It should answer 304 for an unchanged page and 200 once it changes"""
+        self._create_accounts(3)
+        etag = self.client.get(BASE_URL).headers["ETag"]
+        resp = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self._post_account()
+        resp = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.get_json()), 4)
+
+    def test_search_accounts(self):
+        """It should filter Accounts by email, name prefix and join date"""
+        self._create_accounts(3)
+        self._post_account(name="Alice Smith", email="Alice@Example.com")
+        self._post_account(name="Alicia Jones", email="alicia@example.com")
+        with self.app.app_context():
+            db.session.execute(Account.__table__.update().where(Account.email == "test0@example.com")
+                               .values(date_joined=datetime(2020, 1, 1)))
+            db.session.execute(Account.__table__.update().where(Account.email == "test1@example.com")
+                               .values(date_joined=datetime(2021, 6, 1)))
+            db.session.commit()
+
+        def emails(query):
+            resp = self.client.get(f"{BASE_URL}?{query}")
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            return [account["email"] for account in resp.get_json()]
+
+        self.assertEqual(emails("email=alice@EXAMPLE.com"), ["Alice@Example.com"])
+        self.assertEqual(emails("name_prefix=Ali"), ["Alice@Example.com", "alicia@example.com"])
+        self.assertEqual(emails("name_prefix=Alic&email=alicia@example.com"), ["alicia@example.com"])
+        self.assertEqual(emails("name_prefix=ali"), [])
+        self.assertEqual(emails("joined_before=2021-01-01"), ["test0@example.com"])
+        self.assertEqual(emails("joined_after=2020-01-01&joined_before=2021-06-01T00:00:01%2B00:00"),
+                         ["test0@example.com", "test1@example.com"])
+        self.assertEqual(emails("joined_after=2020-01-01T00:00:00Z&joined_before=2021-06-01T00:00:01z"),
+                         ["test0@example.com", "test1@example.com"])
+        self.assertEqual(emails("email=nobody@example.com"), [])
+
+        resp = self.client.get(f"{BASE_URL}?name_prefix=Test&limit=2")
+        self.assertIn("name_prefix=Test", resp.headers["Link"])
+        lines = self.client.get(f"{BASE_URL}?name_prefix=Alic", headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(len(lines.get_data(as_text=True).splitlines()), 2)
+        for value in ("yesterday", "Z"):
+            resp = self.client.get(f"{BASE_URL}?joined_after={value}")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_accounts_uses_indexes(self):
+        """It should answer each search filter from an index"""
+        with self.app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+            searches = {
+                "ix_accounts_email_lower": {"email": "a@example.com"},
+                "ix_accounts_name": {"name_prefix": "Al"},
+                "ix_accounts_date_joined": {"joined_after": datetime(2020, 1, 1), "joined_before": datetime(2021, 1, 1)},
+            }
+            for index, search in searches.items():
+                query = Account.query.filter(*Account.search_criteria(**search)).order_by(Account.id).limit(5)
+                sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+                plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+                self.assertIn(index, " ".join(row[-1] for row in plan))
+
+    def test_full_text_search(self):
+        """It should find Accounts by partial name or address words, best match first"""
+        with self.app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                self.skipTest("The expected order follows the FTS5 bm25 ranking")
+        self._post_account(name="Bob Stone", email="bob@example.com", address="12 Oak Lane Apartment Building Five")
+        self._post_account(name="Oak Tree Cafe", email="cafe@example.com", address="Oak Street")
+        self._post_account(name="Carol", email="carol@example.com", address="7 Elm Road")
+
+        def names(query):
+            resp = self.client.get(f"{BASE_URL}/search?{query}")
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            return [account["name"] for account in resp.get_json()]
+
+        self.assertEqual(names("q=oak"), ["Oak Tree Cafe", "Bob Stone"])
+        self.assertEqual(names("q=OA+lan"), ["Bob Stone"])
+        self.assertEqual(names("q=elm%20ro&fields=name"), ["Carol"])
+        self.assertEqual(names("q=birch"), [])
+        resp = self.client.get(f"{BASE_URL}/search?q=oak&limit=1")
+        self.assertIn("offset=1", resp.headers["Link"])
+        next_url = resp.headers["Link"].split(";")[0].strip("<>")
+        self.assertEqual([account["name"] for account in self.client.get(next_url).get_json()], ["Bob Stone"])
+
+    def test_full_text_search_stays_in_sync(self):
+        """It should reflect creates, updates, bulk writes and deletes in search results"""
+        account_id = self._post_account(name="Dana", email="dana@example.com", address="1 Pine Way").get_json()["id"]
+        self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Dana", "email": "dana@example.com",
+                                                          "address": "9 Birch Court"})
+        self._seed_accounts(2)
+
+        def ids(query):
+            return [account["id"] for account in self.client.get(f"{BASE_URL}/search?q={query}").get_json()]
+
+        self.assertEqual(ids("pine"), [])
+        self.assertEqual(ids("birch"), [account_id])
+        self.assertEqual(len(ids("seed")), 2)
+        self.client.delete(f"{BASE_URL}/{account_id}")
+        self.assertEqual(ids("birch"), [])
+
+    def test_full_text_search_bad_request(self):
+        """It should reject searches without words or with bad paging"""
+        for query in ("", "q=", "q=%22*%22", "q=oak&offset=-1", "q=oak&limit=x"):
+            resp = self.client.get(f"{BASE_URL}/search?{query}")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_accounts_sparse_fields(self):
+        """It should return only the requested fields and select only their columns"""
+        self._create_accounts(3)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            resp = self.client.get(f"{BASE_URL}?fields=email,id&limit=2")
+        finally:
+            with self.app.app_context():
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([set(account) for account in resp.get_json()], [{"id", "email"}] * 2)
+        self.assertIn("fields=email", resp.headers["Link"])
+        select_sql = next(sql for sql in statements if sql.lstrip().upper().startswith("SELECT"))
+        self.assertNotIn("address", select_sql)
+        self.assertNotIn("phone_number", select_sql)
+
+        full_etag = self.client.get(f"{BASE_URL}?limit=2").headers["ETag"]
+        self.assertNotEqual(resp.headers["ETag"], full_etag)
+        lines = self.client.get(f"{BASE_URL}?fields=name", headers={"Accept": "application/x-ndjson"}).get_data(as_text=True)
+        self.assertEqual([json.loads(line) for line in lines.splitlines()],
+                         [{"name": f"Test Account {i}"} for i in range(3)])
+
+    def test_read_an_account_sparse_fields(self):
+        """It should return a subset of an Account's fields with its own ETag"""
+        created = self._post_account()
+        account_id = created.get_json()["id"]
+        resp = self.client.get(f"{BASE_URL}/{account_id}?fields=name,date_joined")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(set(data), {"name", "date_joined"})
+        self.assertEqual(data["date_joined"], created.get_json()["date_joined"])
+        self.assertNotEqual(resp.headers["ETag"], created.headers["ETag"])
+
+        cached = self.client.get(f"{BASE_URL}/{account_id}?fields=name,date_joined")
+        self.assertEqual(cached.get_json(), data)
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Sparse", "email": "sparse@example.com"},
+                               headers={"If-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_sparse_fields_bad_request(self):
+        """It should reject unknown or empty field lists"""
+        self._create_accounts(1)
+        for fields in ("version", "name,password", ""):
+            resp = self.client.get(f"{BASE_URL}?fields={fields}")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(f"{BASE_URL}/1?fields=secret")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_account(self):
+        """It should update only the supplied fields of an Account"""
+        created = self._post_account(phone_number="555-0000")
+        account_id = created.get_json()["id"]
+        resp = self.client.patch(f"{BASE_URL}/{account_id}", json={"address": "2 Patch Rd", "id": 999})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual(data["id"], account_id)
+        self.assertEqual(data["address"], "2 Patch Rd")
+        self.assertEqual(data["name"], "Tagged")
+        self.assertEqual(data["phone_number"], "555-0000")
+        self.assertNotEqual(resp.headers["ETag"], created.headers["ETag"])
+        self.assertEqual(self.client.get(f"{BASE_URL}/{account_id}").get_json(), data)
+
+        resp = self.client.patch(f"{BASE_URL}/{account_id}", json={"name": "Late"},
+                                 headers={"If-Match": created.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        resp = self.client.patch(f"{BASE_URL}/0", json={"name": "Ghost"})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        for body in ({}, {"version": 7}, ["name"]):
+            resp = self.client.patch(f"{BASE_URL}/{account_id}", json=body)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_are_single_statements(self):
+        """It should update and delete without reading the Account first"""
+        account_id = self._post_account().get_json()["id"]
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0].upper())
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Put", "email": "put@example.com"})
+            self.client.patch(f"{BASE_URL}/{account_id}", json={"name": "Patch"})
+            self.client.delete(f"{BASE_URL}/{account_id}")
+        finally:
+            with self.app.app_context():
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(statements, ["UPDATE", "UPDATE", "DELETE"])
+
+    def test_create_duplicate_email_conflicts(self):
+        """It should answer 409 for a duplicate email and 400 for a missing name"""
+        self._post_account(email="dup@example.com")
+        resp = self.client.post(BASE_URL, json={"name": "Again", "email": "dup@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        resp = self.client.post(BASE_URL, json={"email": "nameless@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        other_id = self._post_account(email="other@example.com").get_json()["id"]
+        resp = self.client.patch(f"{BASE_URL}/{other_id}", json={"email": "dup@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(self.client.get(BASE_URL).get_json()), 2)
+
+    def test_upsert_account_by_email(self):
+        """It should create an Account by email, then replace it in place"""
+        url = f"{BASE_URL}/by-email/up+sert@example.com"
+        resp = self.client.put(url, json={"name": "First", "address": "1 Upsert Way"})
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        created = resp.get_json()
+        self.assertEqual(created["email"], "up+sert@example.com")
+        self.assertTrue(resp.headers["Location"].endswith(f"{BASE_URL}/{created['id']}"))
+
+        self.client.get(f"{BASE_URL}/{created['id']}")
+        resp = self.client.put(url, json={"name": "Second", "email": "up+sert@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        updated = resp.get_json()
+        self.assertEqual(updated["id"], created["id"])
+        self.assertEqual(updated["date_joined"], created["date_joined"])
+        self.assertIsNone(updated["address"])
+        self.assertEqual(resp.headers["ETag"], f'"{created["id"]}-2"')
+        self.assertEqual(self.client.get(f"{BASE_URL}/{created['id']}").get_json(), updated)
+        self.assertEqual(len(self.client.get(BASE_URL).get_json()), 1)
+
+    def test_upsert_account_bad_request(self):
+        """It should reject upserts without a name or with a different email"""
+        url = f"{BASE_URL}/by-email/bad@example.com"
+        self.assertEqual(self.client.put(url, json={"address": "Nowhere"}).status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.put(url, json={"name": "Bad", "email": "other@example.com"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(BASE_URL).get_json(), [])
+
+    def test_update_account_if_match(self):
+        """It should update only when If-Match holds the current version"""
+        created = self._post_account()
+        account_id = created.get_json()["id"]
+        etag = created.headers["ETag"]
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "First", "email": "first@example.com"},
+                               headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.get_json()["name"], "First")
+        self.assertIsNone(resp.get_json()["address"])
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+        resp = self.client.put(f"{BASE_URL}/{account_id}", json={"name": "Lost", "email": "lost@example.com"},
+                               headers={"If-Match": etag})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{account_id}").get_json()["name"], "First")
+
+        resp = self.client.put(f"{BASE_URL}/0", json={"name": "Ghost", "email": "ghost@example.com"},
+                               headers={"If-Match": '"0-1"'})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_account_if_match(self):
+        """It should delete only when If-Match holds the current version"""
+        created = self._post_account()
+        account_id = created.get_json()["id"]
+        resp = self.client.delete(f"{BASE_URL}/{account_id}", headers={"If-Match": '"not-ours"'})
+        self.assertEqual(resp.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        resp = self.client.delete(f"{BASE_URL}/{account_id}", headers={"If-Match": created.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{account_id}").status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.delete(f"{BASE_URL}/{account_id}", headers={"If-Match": created.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_update_bumps_version(self):
+        """It should change the ETag of Accounts updated in bulk"""
+        created = self._post_account()
+        account_id = created.get_json()["id"]
+        operations = [{"op": "update", "id": account_id, "data": {"name": "Bulk", "email": "tagged@example.com"}}]
+        self.client.post(f"{BASE_URL}/_bulk", json=operations)
+        resp = self.client.get(f"{BASE_URL}/{account_id}", headers={"If-None-Match": created.headers["ETag"]})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_bulk_operations(self):
+        """It should apply creates, updates and deletes in one request"""
+        self._create_accounts(3)
+        ids = [account["id"] for account in self.client.get(BASE_URL).get_json()]
+        operations = [
+            {"op": "create", "data": {"name": "Bulk A", "email": "bulk-a@example.com"}},
+            {"op": "create", "data": {"name": "Bulk B", "email": "bulk-b@example.com", "address": "1 Bulk Rd"}},
+            {"op": "update", "id": ids[0], "data": {"name": "Renamed", "email": "renamed@example.com"}},
+            {"op": "delete", "id": ids[1]},
+        ]
+        resp = self.client.post(f"{BASE_URL}/_bulk", json=operations)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        results = resp.get_json()
+        self.assertEqual([result["status"] for result in results], [201, 201, 200, 204])
+        self.assertEqual([result["index"] for result in results], [0, 1, 2, 3])
+
+        created = self.client.get(f"{BASE_URL}/{results[1]['id']}").get_json()
+        self.assertEqual(created["address"], "1 Bulk Rd")
+        self.assertIsNotNone(created["date_joined"])
+        self.assertEqual(self.client.get(f"{BASE_URL}/{ids[0]}").get_json()["name"], "Renamed")
+        self.assertEqual(self.client.get(f"{BASE_URL}/{ids[1]}").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_operations_fail_per_item(self):
+        """It should fail only the items that are invalid"""
+        self._create_accounts(2)
+        first_id = self.client.get(BASE_URL).get_json()[0]["id"]
+        operations = [
+            {"op": "create", "data": {"name": "Fresh", "email": "fresh@example.com"}},
+            {"op": "create", "data": {"name": "Dup", "email": "test0@example.com"}},
+            {"op": "create", "data": {"name": "Again", "email": "fresh@example.com"}},
+            {"op": "create", "data": {"name": "No email"}},
+            {"op": "update", "id": 0, "data": {"name": "Ghost", "email": "ghost@example.com"}},
+            {"op": "update", "id": first_id, "data": {"name": "Steal", "email": "test1@example.com"}},
+            {"op": "delete", "id": 0},
+            {"op": "rename"},
+            "not an operation",
+            {"op": "update", "id": True, "data": {"name": "Bool", "email": "bool@example.com"}},
+            {"op": "delete", "id": True},
+        ]
+        resp = self.client.post(f"{BASE_URL}/_bulk", json=operations)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        codes = [result["status"] for result in resp.get_json()]
+        self.assertEqual(codes, [201, 409, 409, 400, 404, 409, 404, 400, 400, 400, 400])
+        emails = {account["email"] for account in self.client.get(BASE_URL).get_json()}
+        self.assertEqual(emails, {"fresh@example.com", "test0@example.com", "test1@example.com"})
+
+    def test_bulk_operations_bad_request(self):
+        """It should reject a bulk body that is not a bounded array"""
+        resp = self.client.post(f"{BASE_URL}/_bulk", json={"op": "create"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.app.config['BULK_MAX_OPERATIONS'] = 1
+        try:
+            resp = self.client.post(f"{BASE_URL}/_bulk", json=[{"op": "delete", "id": 1}] * 2)
+        finally:
+            self.app.config['BULK_MAX_OPERATIONS'] = 10000
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_get(self):
+        """It should return the Accounts listed in ids in request order, and the ids it did not find"""
+        self._seed_accounts(5)
+        resp = self.client.get(f"{BASE_URL}?ids=4,999,2,4,1")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.get_json()
+        self.assertEqual([account["id"] for account in data["accounts"]], [4, 2, 1])
+        self.assertEqual(data["accounts"][0], self.client.get(f"{BASE_URL}/4").get_json())
+        self.assertEqual(data["missing"], [999])
+        resp = self.client.post(f"{BASE_URL}/_get", json={"ids": [3, 5, 0]})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([account["id"] for account in resp.get_json()["accounts"]], [3, 5])
+        self.assertEqual(resp.get_json()["missing"], [0])
+        resp = self.client.get(f"{BASE_URL}?ids=2,1&fields=email")
+        self.assertEqual(resp.get_json()["accounts"], [{"email": "seed1@example.com"}, {"email": "seed0@example.com"}])
+
+    def test_batch_get_in_chunks(self):
+        """It should fetch long id lists with one IN query per chunk"""
+        self._seed_accounts(25)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        self.app.config['BATCH_GET_CHUNK_SIZE'] = 10
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            resp = self.client.post(f"{BASE_URL}/_get", json={"ids": list(range(30, 0, -1))})
+        finally:
+            self.app.config['BATCH_GET_CHUNK_SIZE'] = 500
+            with self.app.app_context():
+                event.remove(db.engine, "before_cursor_execute", record)
+        data = resp.get_json()
+        self.assertEqual([account["id"] for account in data["accounts"]], list(range(25, 0, -1)))
+        self.assertEqual(data["missing"], [30, 29, 28, 27, 26])
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(all(" IN " in statement for statement in statements))
+
+    def test_batch_get_bad_request(self):
+        """It should reject malformed, empty and oversized id lists"""
+        for url in (f"{BASE_URL}?ids=1,two", f"{BASE_URL}?ids=", f"{BASE_URL}?ids=1&fields=nope"):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST, url)
+        for body in ([1, 2], {"ids": "1,2"}, {"ids": [1, "2"]}, {"ids": [True]}, {"ids": []}):
+            resp = self.client.post(f"{BASE_URL}/_get", json=body)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, body)
+        self.app.config['BATCH_GET_MAX_IDS'] = 2
+        try:
+            resp = self.client.get(f"{BASE_URL}?ids=1,2,3")
+        finally:
+            self.app.config['BATCH_GET_MAX_IDS'] = 1000
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
     # TODO: Enable these tests once security headers are properly configured
     # def test_security_headers(self):
     #     """It should return security headers"""
@@ -0,0 +1,72 @@
+"""
+Test cases for the security and CORS header layer
+"""
+import unittest
+from service import status
+from service import app, talisman
+from service.headers import HSTS_HEADER, SECURITY_HEADERS, SecureHeaders
+from service.routes import create_app
+
+HTTPS_ENVIRON = {'wsgi.url_scheme': 'https'}
+
+
+class TestSecureHeaders(unittest.TestCase):
+    """Test Cases for SecureHeaders"""
+
+    @classmethod
+    def setUpClass(cls):
+        """This runs once before the entire test suite"""
+        app.config['TESTING'] = True
+        cls.client = app.test_client()
+
+    def test_security_headers(self):
+        """It should send every security header, and HSTS only over HTTPS"""
+        resp = self.client.get("/")
+        for name, value in SECURITY_HEADERS:
+            self.assertEqual(resp.headers[name], value)
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], "*")
+        self.assertNotIn("Vary", resp.headers)
+        self.assertNotIn(HSTS_HEADER[0], resp.headers)
+        resp = self.client.get("/", environ_overrides=HTTPS_ENVIRON)
+        self.assertEqual(resp.headers[HSTS_HEADER[0]], HSTS_HEADER[1])
+
+    def test_error_responses(self):
+        """It should add the headers to error responses too"""
+        resp = self.client.get("/no-such-page")
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(resp.headers["X-Frame-Options"], "SAMEORIGIN")
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], "*")
+
+    def test_cross_origin(self):
+        """It should echo the Origin and answer preflight requests"""
+        origin = "https://example.com"
+        resp = self.client.get("/", headers={"Origin": origin})
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], origin)
+        self.assertEqual(resp.headers["Vary"], "Origin")
+        self.assertNotIn("Access-Control-Allow-Methods", resp.headers)
+        resp = self.client.options("/accounts", headers={
+            "Origin": origin, "Access-Control-Request-Method": "PUT", "Access-Control-Request-Headers": "Content-Type"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.headers["Access-Control-Allow-Headers"], "Content-Type")
+        self.assertIn("PUT", resp.headers["Access-Control-Allow-Methods"])
+        self.assertEqual(resp.headers["X-Content-Type-Options"], "nosniff")
+
+    def test_talisman_compatibility(self):
+        """It should stay reachable as service.talisman with a force_https switch"""
+        self.assertIsInstance(talisman, SecureHeaders)
+        self.assertIs(talisman.app, app)
+        self.assertFalse(talisman.force_https)
+
+    def test_force_https(self):
+        """It should redirect plain HTTP to HTTPS outside testing and behind no HTTPS proxy"""
+        https_app = create_app()
+        SecureHeaders(https_app, force_https=True)
+        client = https_app.test_client()
+        resp = client.get("/?page=2")
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp.headers["Location"], "https://localhost/?page=2")
+        self.assertEqual(resp.headers["X-Frame-Options"], "SAMEORIGIN")
+        self.assertEqual(client.get("/", environ_overrides=HTTPS_ENVIRON).status_code, status.HTTP_200_OK)
+        self.assertEqual(client.get("/", headers={"X-Forwarded-Proto": "https"}).status_code, status.HTTP_200_OK)
+        https_app.config['TESTING'] = True
+        self.assertEqual(client.get("/").status_code, status.HTTP_200_OK)